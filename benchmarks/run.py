@@ -0,0 +1,282 @@
+"""Benchmarks of gh-gen on synthetic workflows.
+
+    python benchmarks/run.py run [--shape medium] [--output results.json]
+    python benchmarks/run.py compare [RESULTS] [--baseline FILE] [--threshold 0.2]
+
+`run` measures each case a few times and writes the best and median times, along
+with the commit they were measured at. `compare` reports how results (measured
+anew if not given) fare against the baseline, and fails on regressions beyond a
+threshold. Update the baseline with `run --output benchmarks/baseline.json`.
+"""
+
+import argparse
+import dataclasses
+import io
+import json
+import logging
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+_root = pathlib.Path(__file__).resolve().parent
+sys.path[:0] = [str(_root.parent / "src"), str(_root)]
+
+from ghgen.commands.generate import generate_all, _input_files, _load
+from ghgen.commands.lock.utils import LockData, RemoteAction, ActionInput
+from ghgen.commands.utils import load, dump, thread_yaml
+from ghgen.element import Element
+from ghgen.expr import Expr, reftree
+from ghgen.rules import RuleSet, rule
+from ghgen.syntax import WorkflowInfo, Contexts
+
+from synthetic import Shape, shapes, write_modules
+
+baseline_file = _root / "baseline.json"
+
+
+class _Rules(RuleSet):
+    """Rules on common contexts, all passing, to time matching them."""
+
+    @rule(Contexts.matrix._)
+    def matrix(self, *args, **kwargs):
+        return True
+
+    @rule(Contexts.steps._.outcome)
+    def outcome(self, *args, **kwargs):
+        return True
+
+    @rule(Contexts.github)
+    def github(self, *args, **kwargs):
+        return True
+
+
+def _exprs(x: typing.Any) -> typing.Generator[Expr, None, None]:
+    match x:
+        case Expr():
+            yield x
+        case Element():
+            for f in dataclasses.fields(x):
+                if f.init:
+                    yield from _exprs(getattr(x, f.name))
+        case dict():
+            for v in x.values():
+                yield from _exprs(v)
+        case list():
+            for v in x:
+                yield from _exprs(v)
+
+
+def _touch(files: list[pathlib.Path]):
+    # new modification times make the loader execute the modules again
+    for f in files:
+        stat = f.stat()
+        os.utime(f, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+class _Bench:
+    def __init__(self, shape: Shape, dir: pathlib.Path):
+        self.shape = shape
+        self.dir = dir
+        self.inputs = dir / "workflows"
+        self.output = dir / "out"
+        self.output.mkdir()
+        self.files = write_modules(self.inputs, shape)
+        self.opts = argparse.Namespace(
+            includes=[self.inputs],
+            inputs=[],
+            output_directory=self.output,
+            check=False,
+        )
+        self.lock = LockData(
+            actions=[
+                RemoteAction(
+                    id=f"action{i}",
+                    requested_name=None,
+                    name=f"Action {i}",
+                    inputs=[
+                        ActionInput(name=f"in_{j}", id=f"in-{j}", required=j == 0)
+                        for j in range(shape.env)
+                    ],
+                    outputs=[f"out{j}" for j in range(shape.env)],
+                    owner="owner",
+                    repo=f"repo{i}",
+                    path="",
+                    ref="v1",
+                    resolved_ref="v1",
+                    sha="0" * 40,
+                )
+                for i in range(shape.jobs * shape.modules)
+            ]
+        )
+
+    def workflows(self) -> list[WorkflowInfo]:
+        return [w for f in _input_files([self.inputs]) for w in _load(f)]
+
+    def setup(self):
+        _touch(self.files)
+        assert generate_all(self.opts) == 0
+        self.built = self.workflows()
+        self.data = [w.worfklow.asdict() for w in self.built]
+        self.exprs = [e for w in self.built for e in _exprs(w.worfklow)]
+
+    def cases(self) -> dict[str, typing.Callable[[], typing.Any]]:
+        return {
+            "generate_all": self.generate_all,
+            "generate_all --check": self.check,
+            "build": self.build,
+            "asdict": self.asdict,
+            "yaml": self.yaml,
+            "validate": self.validate,
+            "reftree": self.reftree,
+            "lock dump+load": self.lock_roundtrip,
+        }
+
+    def generate_all(self):
+        _touch(self.files)
+        assert generate_all(self.opts) == 0
+
+    def check(self):
+        _touch(self.files)
+        opts = argparse.Namespace(**{**vars(self.opts), "check": True})
+        assert generate_all(opts) == 0
+
+    def build(self):
+        for w in self.built:
+            w._workflow = None
+            w.worfklow
+
+    def asdict(self):
+        for w in self.built:
+            w.worfklow.asdict()
+
+    def yaml(self):
+        for d in self.data:
+            thread_yaml().dump(d, io.StringIO())
+
+    def validate(self):
+        rules = _Rules()
+        for e in self.exprs:
+            rules.validate(e)
+
+    def reftree(self):
+        for e in self.exprs:
+            reftree(e)
+
+    def lock_roundtrip(self):
+        file = self.dir / "gh-gen.lock"
+        dump(self.lock, file)
+        assert load(LockData, file) == self.lock
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=_root,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):  # fmt: skip
+        return None
+
+
+def run(shape_name: str, repeat: int, only: list[str] | None = None) -> dict:
+    shape = shapes[shape_name]
+    results = {}
+    with tempfile.TemporaryDirectory() as dir:
+        bench = _Bench(shape, pathlib.Path(dir))
+        bench.setup()
+        for name, case in bench.cases().items():
+            if only and name not in only:
+                continue
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                case()
+                times.append(time.perf_counter() - start)
+            results[name] = {"min": min(times), "median": statistics.median(times)}
+            print(f"{name:<22} {min(times):>9.4f}s", file=sys.stderr)
+    return {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "shape": shape_name,
+        "results": results,
+    }
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> bool:
+    """Print how `results` fare against `baseline`, telling if none regressed."""
+    ok = True
+    for key in ("shape", "python"):
+        if baseline.get(key) != results.get(key):
+            print(
+                f"warning: comparing {key} {results.get(key)} to {baseline.get(key)}",
+                file=sys.stderr,
+            )
+    print(
+        f"{'case':<22} {'baseline':>9} {'current':>9} {'change':>8}"
+        f"   ({baseline.get('commit')} → {results.get('commit')})"
+    )
+    for name, current in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<22} {'':>9} {current['min']:>8.4f}s {'new':>8}")
+            continue
+        change = current["min"] / base["min"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(
+            f"{name:<22} {base['min']:>8.4f}s {current['min']:>8.4f}s {change:>+8.1%}"
+            + ("  ← regression" if regressed else "")
+        )
+    return ok
+
+
+def main(args: typing.Sequence[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.partition("\n")[0])
+    commands = p.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="measure all cases")
+    compare_parser = commands.add_parser("compare", help="compare to the baseline")
+    run_parser.add_argument("--shape", choices=shapes, default="medium")
+    for parser in (run_parser, compare_parser):
+        parser.add_argument("--repeat", type=int, default=7)
+        parser.add_argument(
+            "--case", action="append", dest="cases", help="only run CASE"
+        )
+    run_parser.add_argument("--output", "-o", type=pathlib.Path)
+    compare_parser.add_argument("results", type=pathlib.Path, nargs="?")
+    compare_parser.add_argument("--baseline", type=pathlib.Path, default=baseline_file)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown counted as a regression (0.2 by default)",
+    )
+    opts = p.parse_args(args)
+    logging.disable(logging.INFO)
+    match opts.command:
+        case "run":
+            results = run(opts.shape, opts.repeat, opts.cases)
+            text = json.dumps(results, indent=2) + "\n"
+            if opts.output:
+                opts.output.write_text(text)
+            else:
+                sys.stdout.write(text)
+            return 0
+        case "compare":
+            baseline = json.loads(opts.baseline.read_text())
+            if opts.results:
+                results = json.loads(opts.results.read_text())
+            else:
+                results = run(baseline["shape"], opts.repeat, opts.cases)
+            return 0 if compare(baseline, results, opts.threshold) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
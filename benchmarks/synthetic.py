@@ -0,0 +1,84 @@
+"""Synthetic workflow modules, sized by a `Shape`."""
+
+import dataclasses
+import pathlib
+
+
+@dataclasses.dataclass(frozen=True)
+class Shape:
+    modules: int = 4
+    workflows: int = 2
+    jobs: int = 4
+    steps: int = 10
+    matrix_rows: int = 3
+    env: int = 4
+    expr_depth: int = 3
+
+
+shapes = {
+    "small": Shape(modules=1, workflows=1, jobs=2, steps=5, matrix_rows=2),
+    "medium": Shape(),
+    "large": Shape(
+        modules=8, workflows=4, jobs=8, steps=25, matrix_rows=6, env=8, expr_depth=5
+    ),
+}
+
+
+def _condition(depth: int, job: int, step: int) -> str:
+    """A condition on matrix values, outcomes of earlier steps and `github`."""
+    ret = f'(matrix.k0 != "v{step % 3}")'
+    for d in range(depth):
+        match d % 3:
+            case 0:
+                other = f'(github.ref == "refs/heads/b{job}")'
+                ret = f"({ret} & {other})"
+            case 1 if step:
+                ret = f'({ret} | (steps.s{step - 1}.outcome == "success"))'
+            case 1:
+                ret = f"~{ret}"
+            case _:
+                ret = f'({ret} | contains(github.event_name, "push"))'
+    return ret
+
+
+def module_source(shape: Shape, index: int) -> str:
+    lines = ["from ghgen.syntax import *", ""]
+    for w in range(shape.workflows):
+        lines += ["", "", "@workflow", f"def synthetic_{index}_{w}():"]
+        lines += ["    on.push().pull_request()"]
+        lines += [
+            "    env(" + ", ".join(f'W{e}="value {e}"' for e in range(shape.env)) + ")"
+        ]
+        for j in range(shape.jobs):
+            lines += ["", "    @job", f"    def job{j}():"]
+            if j:
+                lines += [f"        needs(job{j - 1})"]
+            values = ", ".join(f'"v{r}"' for r in range(shape.matrix_rows))
+            lines += [f"        strategy.matrix(k0=[{values}], k1=[1, 2])"]
+            lines += [
+                "        env("
+                + ", ".join(f"J{e}=matrix.k0" for e in range(shape.env))
+                + ")"
+            ]
+            for s in range(shape.steps):
+                env = ", ".join(
+                    f"S{e}={'github.sha' if e % 2 else 'matrix.k1'}"
+                    for e in range(shape.env)
+                )
+                lines += [
+                    f'        run("echo step {s} of job {j}").id("s{s}")'
+                    f".if_({_condition(shape.expr_depth, j, s)}).env({env})"
+                ]
+            lines += [f"        outputs(last=steps.s{shape.steps - 1}.outcome)"]
+    return "\n".join(lines) + "\n"
+
+
+def write_modules(dir: pathlib.Path, shape: Shape) -> list[pathlib.Path]:
+    """Write the modules of `shape` into `dir`."""
+    dir.mkdir(parents=True, exist_ok=True)
+    ret = []
+    for i in range(shape.modules):
+        path = dir / f"synthetic_{i}.py"
+        path.write_text(module_source(shape, i))
+        ret.append(path)
+    return ret
@@ -7,7 +7,7 @@ import textwrap
 import pytest
 
 from ghgen.syntax import workflow, GenerationError
-from src.ghgen.commands.generate import generate_workflow
+from src.ghgen import render
 from src.ghgen.commands.utils import project_dir
 import pathlib
 import inspect
@@ -58,15 +58,11 @@ def expect(expected: str | None = None):
 
     def decorator(f):
         def wrapper(pytestconfig: pytest.Config):
-            wf = workflow(f)
-            output = generate_workflow(wf, pathlib.Path(inspect.getfile(f)).parent)
-            with open(output) as out:
-                actual = [l.rstrip("\n") for l in out]
+            actual = render(workflow(f)).splitlines()
             if expected is None or pytestconfig.getoption("--learn"):
                 pytestconfig.stash[_learn].append((call, "\n".join(actual)))
             else:
                 assert actual == expected.splitlines()
-            output.unlink()
 
         return wrapper
 
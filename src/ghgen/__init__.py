@@ -6,9 +6,11 @@ import colorlog
 
 from .syntax import WorkflowInfo, GenerationError
 from .commands import commands
-from .commands.generate import run as generate
+from .commands.generate import run as generate, render_workflow as render, render_all
 from .commands.utils import relativized_path, project_dir, load, config_file
 from .commands.config import Config
+from .batch import read_repos, run_repos
+from . import profiling
 
 
 def discover_workflows_dir() -> pathlib.Path:
@@ -40,7 +42,60 @@ def options(args: typing.Sequence[str] = None):
             default=config.includes or [],
         )
         parser.add_argument("--verbose", "-v", action="store_true")
+        parser.add_argument(
+            "--repos",
+            type=pathlib.Path,
+            metavar="FILE",
+            help="Run in each of the repository roots listed in FILE, one per line, in a single process",
+        )
         parser.add_argument("--check", "-C", action="store_true")
+        parser.add_argument(
+            "--threads",
+            "-j",
+            type=int,
+            metavar="N",
+            default=1,
+            help="Build workflows with N workers of the backend",
+        )
+        parser.add_argument(
+            "--backend",
+            choices=["threads", "interpreters"],
+            default="threads",
+            help="Run workers as threads (which helps on free-threaded Python builds), or as subinterpreters (Python 3.14+)",
+        )
+        parser.add_argument(
+            "--timings",
+            action="store_true",
+            help="Report the time spent in each phase of the run, and on each workflow file",
+        )
+        parser.add_argument(
+            "--timings-json",
+            type=pathlib.Path,
+            metavar="FILE",
+            help="Write the timings of the run as JSON to FILE",
+        )
+        parser.add_argument(
+            "--trace",
+            type=pathlib.Path,
+            metavar="FILE",
+            help="Write a trace of the run to FILE, in the Chrome trace event format (for Perfetto or chrome://tracing)",
+        )
+        parser.add_argument(
+            "--profile",
+            choices=["cprofile", "sampling"],
+            help="Profile the execution of workflow modules and the building of workflows, telling workflow code from ghgen internals",
+        )
+        parser.add_argument(
+            "--profile-output",
+            type=pathlib.Path,
+            metavar="FILE",
+            help="Where --profile writes pstats data (`gh-gen.prof` by default) or collapsed stacks (`gh-gen.collapsed` by default)",
+        )
+        parser.add_argument(
+            "--memory-report",
+            action="store_true",
+            help="Report the peak and retained memory of building and serializing each workflow",
+        )
 
     common_opts(p)
     p.set_defaults(command=generate, inputs=[], config=config)
@@ -61,6 +116,18 @@ def options(args: typing.Sequence[str] = None):
     return ret
 
 
+def run_command(opts: argparse.Namespace) -> int:
+    """Run the command selected by `opts`, traced and profiled as requested."""
+    _, _, name = opts.command.__module__.rpartition(".")
+    with (
+        profiling.tracing(opts.trace),
+        profiling.profiled(opts.profile, opts.profile_output),
+        profiling.memory_report(opts.memory_report),
+        profiling.span(name),
+    ):
+        return opts.command(opts)
+
+
 class LogFormatter(colorlog.ColoredFormatter):
     def __init__(self):
         super().__init__(
@@ -82,16 +149,35 @@ class LogFormatter(colorlog.ColoredFormatter):
         return super().format(record)
 
 
-def main(args: typing.Sequence[str] = None) -> int:
-    opts = options(args)
+def _batch_options(args: typing.Sequence[str] = None):
+    p = argparse.ArgumentParser(add_help=False)
+    p.add_argument("--repos", type=pathlib.Path)
+    p.add_argument("--verbose", "-v", action="store_true")
+    return p.parse_known_args(args)
+
+
+def _setup_logging(verbose: bool):
     handler = colorlog.StreamHandler()
     handler.setFormatter(LogFormatter())
     logging.basicConfig(
-        level=logging.INFO if not opts.verbose else logging.DEBUG, handlers=[handler]
+        level=logging.INFO if not verbose else logging.DEBUG, handlers=[handler]
     )
+
+
+def main(args: typing.Sequence[str] = None) -> int:
+    batch, rest = _batch_options(args)
+    if batch.repos is not None:
+        # options are parsed in each repository, against its own config
+        _setup_logging(batch.verbose)
+        if batch.verbose:
+            rest.append("--verbose")
+        return run_repos(read_repos(batch.repos), rest)
+    opts = options(args)
+    _setup_logging(opts.verbose)
     logging.debug(opts.__dict__)
     try:
-        return opts.command(opts)
+        with profiling.timings(opts.timings, opts.timings_json):
+            return run_command(opts)
     except Exception as e:
         logging.exception(e, exc_info=opts.verbose)
         return 1
@@ -0,0 +1,85 @@
+"""Running gh-gen over many repositories in one process, with `--repos FILE`.
+
+Each repository is handled as if gh-gen was started from its root: its config
+and lock file are loaded anew, its workflow modules are loaded by a loader of
+their own, and what its workflows added to `sys.path` and `sys.modules` is
+dropped once done. The imported ghgen package stays warm, and
+remote action metadata is only fetched once for all repositories.
+"""
+
+import contextlib
+import logging
+import os
+import pathlib
+import sys
+import typing
+
+from . import profiling
+from .commands.generate import separate_modules
+from .commands.lock.utils import shared_action_metadata
+from .commands.utils import project_dir
+
+
+def read_repos(file: str | os.PathLike) -> list[pathlib.Path]:
+    """Repository roots listed in `file`, one per line.
+
+    Blank lines and lines starting with `#` are skipped, and relative paths are
+    taken relative to the directory of `file`.
+    """
+    file = pathlib.Path(file)
+    ret = []
+    with open(file) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                ret.append(file.parent / line)
+    return ret
+
+
+@contextlib.contextmanager
+def repository(root: str | os.PathLike) -> typing.Generator[pathlib.Path, None, None]:
+    """Work from `root`, restoring the process state shared with other repositories."""
+    root = pathlib.Path(root).resolve()
+    cwd = os.getcwd()
+    path = list(sys.path)
+    modules = set(sys.modules)
+    os.chdir(root)
+    project_dir.cache_clear()
+    try:
+        with separate_modules():
+            yield root
+    finally:
+        os.chdir(cwd)
+        project_dir.cache_clear()
+        sys.path[:] = path
+        for name in set(sys.modules) - modules:
+            file = getattr(sys.modules[name], "__file__", None)
+            if file is not None and pathlib.Path(file).is_relative_to(root):
+                del sys.modules[name]
+
+
+def run_repos(
+    roots: typing.Iterable[str | os.PathLike], args: typing.Sequence[str] = ()
+) -> int:
+    """Run gh-gen with `args` in each of `roots`, returning the worst exit code.
+
+    A repository failing does not stop the others from being handled.
+    """
+    from . import options, run_command
+
+    ret = 0
+    with shared_action_metadata():
+        for root in roots:
+            logging.info(f"# {root}")
+            with repository(root):
+                try:
+                    opts = options(args)
+                    with profiling.timings(opts.timings, opts.timings_json):
+                        code = run_command(opts) or 0
+                except Exception as e:
+                    logging.exception(
+                        e, exc_info=logging.root.isEnabledFor(logging.DEBUG)
+                    )
+                    code = 1
+            ret = max(ret, code)
+    return ret
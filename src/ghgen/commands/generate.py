@@ -1,14 +1,22 @@
 import argparse
-import importlib.util
+import concurrent.futures
+import contextlib
+import dataclasses
+import io
+import itertools
 import logging
+import os
 import sys
 import pathlib
 import difflib
+import typing
 
 from ruamel.yaml import CommentedMap
 
-from ..syntax import WorkflowInfo, GenerationError
-from .utils import DiffError, yaml
+from ..syntax import Error, WorkflowInfo, GenerationError
+from ..profiling import phase
+from .utils import DiffError, thread_yaml
+from .loader import ModuleLoader
 from .lock.sync import run as sync
 
 aliases = ["g", "gen"]
@@ -25,60 +33,224 @@ def add_arguments(parser: argparse.ArgumentParser):
     )
 
 
-def generate_workflow(
-    w: WorkflowInfo, dir: pathlib.Path, check=False
-) -> pathlib.Path | None:
+def render_workflow(w: WorkflowInfo) -> str:
+    """Build `w` and return its YAML, headed by where it was generated from."""
     input = f"{w.file.name}::{w.spec.__name__}"
-    output = (dir / w.id).with_suffix(".yml")
+    workflow = w.worfklow
+    with phase("asdict", w.file, id=w.id):
+        data = CommentedMap(workflow.asdict())
+    data.yaml_set_start_comment(f"generated from {input}")
+    out = io.StringIO()
+    with phase("yaml", w.file, id=w.id):
+        thread_yaml().dump(data, out)
+    return out.getvalue()
+
+
+def write_workflow(id: str, text: str, dir: pathlib.Path, check=False) -> pathlib.Path:
+    output = (dir / id).with_suffix(".yml")
     tmp = output.with_suffix(".yml.tmp")
-    w = w.worfklow.asdict()
-    w = CommentedMap(w)
-    w.yaml_set_start_comment(f"generated from {input}")
-    with open(tmp, "w") as out:
-        yaml.dump(w, out)
+    with phase("write", output):
+        with open(tmp, "w") as out:
+            out.write(text)
     if check:
-        if output.exists():
-            with open(output) as current:
-                current = [*current]
-        else:
-            current = []
-        with open(tmp) as new:
-            new = [*new]
-        diff = list(difflib.unified_diff(current, new, str(output), str(tmp)))
-        if diff:
-            raise DiffError([l.rstrip("\n") for l in diff])
-        tmp.unlink()
+        with phase("diff", output):
+            if output.exists():
+                with open(output) as current:
+                    current = [*current]
+            else:
+                current = []
+            with open(tmp) as new:
+                new = [*new]
+            diff = list(difflib.unified_diff(current, new, str(output), str(tmp)))
+            if diff:
+                raise DiffError([l.rstrip("\n") for l in diff])
+            tmp.unlink()
     else:
-        tmp.rename(output)
+        with phase("write", output):
+            tmp.rename(output)
     return output
 
 
+def generate_workflow(
+    w: WorkflowInfo, dir: pathlib.Path, check=False
+) -> pathlib.Path | None:
+    return write_workflow(w.id, render_workflow(w), dir, check)
+
+
+def _input_files(
+    inputs: typing.Iterable[str | os.PathLike],
+) -> typing.Generator[pathlib.Path, None, None]:
+    for i in map(pathlib.Path, inputs):
+        logging.debug(f"@ {i}")
+        if i.is_dir():
+            yield from i.glob("*.py")
+        else:
+            yield i
+
+
+# workflow modules, kept between runs in the same process
+_loader = ModuleLoader()
+
+
+@contextlib.contextmanager
+def separate_modules() -> typing.Generator[ModuleLoader, None, None]:
+    """Load workflow modules with a loader of their own while in this context.
+
+    Modules loaded meanwhile are not reused afterwards, nor are the ones loaded
+    before reused meanwhile.
+    """
+    global _loader
+    previous, _loader = _loader, ModuleLoader()
+    try:
+        yield _loader
+    finally:
+        _loader = previous
+
+
+def _load(f: pathlib.Path) -> typing.Generator[WorkflowInfo, None, None]:
+    logging.debug(f"← {f}")
+    with phase("exec", f):
+        mod = _loader.load(f)
+    for k, v in mod.__dict__.items():
+        if isinstance(v, WorkflowInfo):
+            yield v
+
+
+# id, YAML text and errors of a workflow
+type _Result = tuple[str, str | None, list[Error]]
+
+
+def _try_render(w: WorkflowInfo) -> _Result:
+    try:
+        return w.id, render_workflow(w), []
+    except GenerationError as e:
+        return w.id, None, e.errors
+
+
+def render_all(
+    paths: typing.Iterable[str | os.PathLike],
+    includes: typing.Iterable[str | os.PathLike] | None = None,
+) -> dict[str, str]:
+    """Render the workflows defined in `paths`, files or directories of them.
+
+    Nothing is written: the YAML text of each workflow is returned by id. The
+    errors of all workflows failing to build are raised together. Modules are
+    imported from `includes`, by default the directories among `paths`, and
+    unchanged ones are reused by later calls.
+    """
+    paths = [pathlib.Path(p) for p in paths]
+    if includes is None:
+        includes = [p for p in paths if p.is_dir()]
+    ret = {}
+    errors = []
+    with _loader.using(includes):
+        for id, text, workflow_errors in (
+            _try_render(w) for f in _input_files(paths) for w in _load(f)
+        ):
+            if text is None:
+                errors += workflow_errors
+            else:
+                ret[id] = text
+    if errors:
+        raise GenerationError(errors)
+    return ret
+
+
+def _render_file(
+    path: str, includes: list[str]
+) -> list[tuple[str, str | None, list[tuple]]]:
+    """Load a file and render its workflows, in an interpreter of the pool.
+
+    Only plain data is returned, as it is copied back to the main interpreter.
+    """
+    sys.modules["ghgen"] = sys.modules[__name__]
+    with _loader.using(includes):
+        return [
+            (id, text, [dataclasses.astuple(e) for e in errors])
+            for id, text, errors in map(_try_render, _load(pathlib.Path(path)))
+        ]
+
+
+def _render_in_interpreters(
+    files: list[pathlib.Path],
+    includes: list[pathlib.Path],
+    executor: concurrent.futures.Executor,
+) -> typing.Generator[_Result, None, None]:
+    for results in executor.map(
+        _render_file,
+        map(str, files),
+        itertools.repeat([str(i) for i in includes]),
+    ):
+        for id, text, errors in results:
+            yield id, text, [Error(*e) for e in errors]
+
+
+def _render_all(
+    inputs: list[pathlib.Path],
+    includes: list[pathlib.Path],
+    backend: str,
+    workers: int,
+    stack: contextlib.ExitStack,
+) -> typing.Iterable[_Result]:
+    stack.enter_context(_loader.using(includes))
+    with phase("discovery"):
+        files = list(_input_files(inputs))
+    match backend:
+        case "interpreters":
+            try:
+                pool = concurrent.futures.InterpreterPoolExecutor
+            except AttributeError:
+                raise RuntimeError(
+                    "the `interpreters` backend requires Python 3.14 or later"
+                ) from None
+            # `_render_file` is sent by name, so interpreters need our `sys.path`
+            # to import it
+            setup = f"import sys; sys.path[:] = {[str(p) for p in sys.path]!r}"
+            executor = stack.enter_context(
+                pool(workers, initializer=exec, initargs=(setup,))
+            )
+            return _render_in_interpreters(files, includes, executor)
+        case _ if workers > 1:
+            executor = stack.enter_context(
+                concurrent.futures.ThreadPoolExecutor(workers)
+            )
+            workflows = [w for f in files for w in _load(f)]
+            return executor.map(_try_render, workflows)
+        case _:
+            return (_try_render(w) for f in files for w in _load(f))
+
+
 def generate_all(opts: argparse.Namespace) -> int:
-    """Generate workflows from the discovered inputs, without syncing the lock file."""
-    sys.path.extend(map(str, opts.includes))
+    """Generate workflows from the discovered inputs, without syncing the lock file.
+
+    Workflow modules loaded by an earlier call in the same process are reused
+    unless they, or modules they import from the includes, changed.
+
+    With `--threads`, workflows are built in a thread pool once all inputs are
+    loaded, which only pays off on free-threaded Python builds. The
+    `interpreters` backend instead loads and builds each input file in a pool
+    of subinterpreters, each with its own state.
+    """
     sys.modules["ghgen"] = sys.modules[__name__]
     inputs = getattr(opts, "inputs", None) or opts.includes
+    backend = getattr(opts, "backend", None) or "threads"
+    workers = getattr(opts, "threads", 1) or 1
     failed = False
     found = False
-    for i in inputs:
-        logging.debug(f"@ {i}")
-        for f in i.glob("*.py"):
-            logging.debug(f"← {f}")
-            spec = importlib.util.spec_from_file_location(f.name, str(f))
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
-            for k, v in mod.__dict__.items():
-                if isinstance(v, WorkflowInfo):
-                    found = True
-                    try:
-                        output = generate_workflow(
-                            v, opts.output_directory, check=opts.check
-                        )
-                        logging.info(f"{'✅' if opts.check else '→'} {output}")
-                    except (GenerationError, DiffError) as e:
-                        failed = True
-                        for error in e.errors:
-                            logging.error(error)
+    with contextlib.ExitStack() as stack:
+        for id, text, errors in _render_all(
+            inputs, opts.includes, backend, workers, stack
+        ):
+            found = True
+            try:
+                if text is None:
+                    raise GenerationError(errors)
+                output = write_workflow(id, text, opts.output_directory, opts.check)
+                logging.info(f"{'✅' if opts.check else '→'} {output}")
+            except (GenerationError, DiffError) as e:
+                failed = True
+                for error in e.errors:
+                    logging.error(error)
     if not found:
         logging.error("no workflows found")
         return 2
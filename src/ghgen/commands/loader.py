@@ -0,0 +1,185 @@
+"""Loading of workflow modules from include directories.
+
+Workflow files and the helper modules they import are registered in
+`sys.modules` under the name a plain `import` would give them, so that a helper
+imported by several workflow files is one module, and a workflow file imported
+by another one is not executed twice. Modules are kept between runs in the same
+process, along with the modules they import from include directories: a module
+is executed again only when its file, or the file of one of its dependencies,
+changed.
+"""
+
+import ast
+import contextlib
+import hashlib
+import importlib.util
+import logging
+import os
+import pathlib
+import sys
+import types
+import typing
+
+
+class _Tracked(typing.NamedTuple):
+    path: pathlib.Path
+    # modification time and size of `path` when the module was executed
+    stamp: tuple[int, int] | None
+    deps: frozenset[str]
+
+
+def _stamp(path: pathlib.Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _module_file(name: str) -> pathlib.Path | None:
+    file = getattr(sys.modules.get(name), "__file__", None)
+    return pathlib.Path(file).resolve() if file is not None else None
+
+
+def _imported_names(module: types.ModuleType, source: str) -> set[str]:
+    """Names of the modules `source` may import, as far as they can be told."""
+    ret = set()
+    package = module.__package__
+    for node in ast.walk(ast.parse(source)):
+        match node:
+            case ast.Import(names=names):
+                modules = [a.name for a in names]
+            case ast.ImportFrom(module=base, names=names, level=level):
+                if level:
+                    if not package:
+                        continue
+                    base = importlib.util.resolve_name(
+                        "." * level + (base or ""), package
+                    )
+                # imported names may be submodules
+                modules = [base, *(f"{base}.{a.name}" for a in names)]
+            case _:
+                continue
+        for m in modules:
+            parts = m.split(".")
+            ret.update(".".join(parts[: i + 1]) for i in range(len(parts)))
+    return ret
+
+
+class ModuleLoader:
+    """Loads workflow files as modules, reusing those that did not change."""
+
+    def __init__(self):
+        self._includes: list[pathlib.Path] = []
+        self._tracked: dict[str, _Tracked] = {}
+
+    @contextlib.contextmanager
+    def using(
+        self, includes: typing.Iterable[str | os.PathLike]
+    ) -> typing.Generator[typing.Self, None, None]:
+        """Load from and import out of `includes` while in this context.
+
+        Include directories are added to `sys.path` for the time being, and
+        modules that changed since they were last loaded are dropped, along with
+        the modules depending on them.
+        """
+        includes = [pathlib.Path(i).resolve() for i in includes]
+        added = [str(i) for i in includes if str(i) not in sys.path]
+        previous = self._includes
+        sys.path.extend(added)
+        self._includes = includes
+        try:
+            self._drop_changed()
+            yield self
+        finally:
+            self._includes = previous
+            for i in added:
+                with contextlib.suppress(ValueError):
+                    sys.path.remove(i)
+
+    def module_name(self, path: pathlib.Path) -> str:
+        """The name `path` is registered under in `sys.modules`.
+
+        This is the name importing it would use, if that finds `path`, and a
+        name private to `path` otherwise.
+        """
+        path = path.resolve()
+        name = path.stem
+        if any(path.parent == i for i in self._includes):
+            with contextlib.suppress(ImportError, ValueError):
+                spec = importlib.util.find_spec(name)
+                if spec is not None and spec.origin is not None:
+                    if pathlib.Path(spec.origin).resolve() == path:
+                        return name
+        digest = hashlib.sha1(str(path).encode()).hexdigest()[:8]
+        return f"_ghgen_{name}_{digest}"
+
+    def load(self, path: pathlib.Path) -> types.ModuleType:
+        """The module of `path`, executed unless it is loaded and unchanged."""
+        path = path.resolve()
+        name = self.module_name(path)
+        if _module_file(name) == path:
+            # loaded before, or imported by another module meanwhile
+            if name not in self._tracked:
+                self._track(name, path, _stamp(path))
+            logging.debug(f"reusing {name}")
+            return sys.modules[name]
+        self._drop({name})
+        stamp = _stamp(path)
+        spec = importlib.util.spec_from_file_location(name, str(path))
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[name] = mod
+        try:
+            spec.loader.exec_module(mod)
+        except BaseException:
+            sys.modules.pop(name, None)
+            raise
+        self._track(name, path, stamp)
+        return mod
+
+    def _in_includes(self, path: pathlib.Path | None) -> bool:
+        return path is not None and any(path.is_relative_to(i) for i in self._includes)
+
+    def _track(self, name: str, path: pathlib.Path, stamp: tuple[int, int] | None):
+        try:
+            source = path.read_text()
+            names = _imported_names(sys.modules[name], source)
+        except (OSError, SyntaxError, ImportError, ValueError):  # fmt: skip
+            names = set()
+        # registered before its dependencies, which may import it in turn
+        self._tracked[name] = _Tracked(path, stamp, frozenset())
+        deps = set()
+        for dep in names - {name}:
+            dep_path = _module_file(dep)
+            if not self._in_includes(dep_path):
+                continue
+            deps.add(dep)
+            if dep not in self._tracked or self._tracked[dep].path != dep_path:
+                # not loaded by us: it was imported when `name` was executed
+                self._track(dep, dep_path, _stamp(dep_path))
+        self._tracked[name] = _Tracked(path, stamp, frozenset(deps))
+
+    def _drop_changed(self):
+        self._drop(
+            {
+                name
+                for name, t in self._tracked.items()
+                if t.stamp is None
+                or _module_file(name) != t.path
+                or _stamp(t.path) != t.stamp
+            }
+        )
+
+    def _drop(self, names: set[str]):
+        """Forget `names` and the modules depending on them."""
+        dependents: dict[str, set[str]] = {}
+        for name, t in self._tracked.items():
+            for dep in t.deps:
+                dependents.setdefault(dep, set()).add(name)
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            stack += dependents.pop(name, ())
+            if self._tracked.pop(name, None) is not None:
+                logging.debug(f"dropping {name}")
+                sys.modules.pop(name, None)
@@ -2,6 +2,7 @@ import dataclasses
 import logging
 import re
 import contextlib
+import contextvars
 import subprocess
 import typing
 import argparse
@@ -11,9 +12,29 @@ import pathlib
 import keyword
 
 from ...element import ConfigElement
+from ...profiling import phase, span, timed
 from ..utils import yaml, project_dir, load, dump
 from ..config import UsesClause
 
+# fetched metadata of remote actions, when shared between several syncs
+_metadata_cache: contextvars.ContextVar[dict[tuple, tuple] | None] = (
+    contextvars.ContextVar("metadata_cache", default=None)
+)
+
+
+@contextlib.contextmanager
+def shared_action_metadata():
+    """Fetch each remote action only once while in this context.
+
+    Used when syncing many repositories in one process, where the same actions
+    come up again and again.
+    """
+    token = _metadata_cache.set({})
+    try:
+        yield
+    finally:
+        _metadata_cache.reset(token)
+
 
 class ActionInput(ConfigElement):
     name: str
@@ -122,7 +143,9 @@ class Action(ConfigElement):
     def fetch(self): ...
 
     def _load(self, f: typing.IO[str]):
-        action_data = yaml.load(f)
+        self._set_metadata(yaml.load(f))
+
+    def _set_metadata(self, action_data: dict):
         self.inputs = [
             ActionInput(
                 name=id.replace("-", "_"), id=id, required=input_data.get("required")
@@ -200,19 +223,23 @@ class RemoteAction(Action):
 
     @contextlib.contextmanager
     def _gh_api(self, mime: str, address: str, *args, **kwargs):
-        with subprocess.Popen(
-            [
-                "gh",
-                "api",
-                "-H",
-                f"Accept: {mime}",
-                f"repos/{self.owner}/{self.repo}/{address}",
-                *args,
-            ],
-            text=True,
-            stdout=subprocess.PIPE,
-            **kwargs,
-        ) as p:
+        url = f"repos/{self.owner}/{self.repo}/{address}"
+        with (
+            phase("gh api", f"{self.owner}/{self.repo}/{address}", url=url),
+            subprocess.Popen(
+                [
+                    "gh",
+                    "api",
+                    "-H",
+                    f"Accept: {mime}",
+                    url,
+                    *args,
+                ],
+                text=True,
+                stdout=subprocess.PIPE,
+                **kwargs,
+            ) as p,
+        ):
             yield p.stdout
         if p.returncode != 0:
             raise subprocess.CalledProcessError(
@@ -228,6 +255,12 @@ class RemoteAction(Action):
 
     def fetch(self):
         """Fetch inputs from the remote action repository."""
+        cache = _metadata_cache.get()
+        key = (self.unversioned_spec, self.ref, self.pinned, self.trusted)
+        if cache is not None and key in cache:
+            self.resolved_ref, self.sha, action_data = cache[key]
+            self._set_metadata(action_data)
+            return
         if self.ref:
             self.resolved_ref = self.ref
         else:
@@ -254,7 +287,10 @@ class RemoteAction(Action):
             )
         )
         with self._gh_api("application/vnd.github.v3.raw", address) as out:
-            self._load(out)
+            action_data = yaml.load(out)
+        self._set_metadata(action_data)
+        if cache is not None:
+            cache[key] = (self.resolved_ref, self.sha, action_data)
 
 
 class ActionDescription(typing.NamedTuple):
@@ -265,6 +301,7 @@ class ActionDescription(typing.NamedTuple):
     name: str | None
 
 
+@timed("lock sync")
 def sync_lock_data(
     args: argparse.Namespace,
     actions_to_update: list[str] | typing.Literal["all", "changed"] = "changed",
@@ -334,7 +371,8 @@ def sync_lock_data(
             trusted=new.trust,
         )
         # TODO: async
-        actions[id].fetch()
+        with span("fetch", action=id, spec=new.spec):
+            actions[id].fetch()
 
         message = [f"{id}: "]
         if prev is None:
@@ -355,5 +393,7 @@ def sync_lock_data(
     args.includes[0].mkdir(parents=True, exist_ok=True)
     generated = args.includes[0] / "actions.py"
     renderer = pystache.Renderer(search_dirs=[pathlib.Path(__file__).parent])
-    with open(generated, "w") as out:
-        out.write(renderer.render_name("actions", lock_data))
+    text = renderer.render_name("actions", lock_data)
+    # left alone if unchanged, so that workflow modules importing it are reused
+    if not generated.exists() or generated.read_text() != text:
+        generated.write_text(text)
@@ -6,6 +6,7 @@ import dataclasses
 import functools
 import subprocess
 import re
+import threading
 from pathlib import PurePosixPath
 from subprocess import CalledProcessError
 
@@ -14,8 +15,26 @@ from ruamel.yaml import YAML
 
 from ..element import ConfigElement, Element, fromobj
 
-yaml = YAML()
-yaml.default_flow_style = False
+
+def _make_yaml() -> YAML:
+    ret = YAML()
+    ret.default_flow_style = False
+    return ret
+
+
+yaml = _make_yaml()
+_thread_yamls = threading.local()
+
+
+def thread_yaml() -> YAML:
+    """A `YAML` set up like `yaml`, for the current thread only.
+
+    `YAML` keeps state while dumping, so threads cannot share one.
+    """
+    ret = getattr(_thread_yamls, "yaml", None)
+    if ret is None:
+        ret = _thread_yamls.yaml = _make_yaml()
+    return ret
 
 
 @functools.cache
@@ -136,22 +136,112 @@ github = Contexts.github
 # env: replaced by a ProxyExpr to also be the `env` field setter
 
 
+class _IdIndex:
+    """Positions by id of the elements of a list, like the steps of a job.
+
+    Appended elements are picked up on the next lookup, while ids set on
+    elements already in the list must be reported with `set_id`.
+    """
+
+    def __init__(self, elements: list):
+        self.elements = elements
+        self.positions: dict[str, int] = {}
+        # positions by `id()` of the elements themselves
+        self.element_positions: dict[int, int] = {}
+        # last suffix allocated for each prefix
+        self.counters: dict[str, int] = {}
+        self.indexed = 0
+
+    def _rebuild(self):
+        self.positions.clear()
+        self.element_positions.clear()
+        self.counters.clear()
+        self.indexed = 0
+
+    def _sync(self):
+        if self.indexed > len(self.elements):
+            self._rebuild()
+        for i in range(self.indexed, len(self.elements)):
+            e = self.elements[i]
+            self.element_positions[id(e)] = i
+            if e.id is not None:
+                self.positions.setdefault(e.id, i)
+        self.indexed = len(self.elements)
+
+    def position(self, id: str) -> int | None:
+        """Position of the first element with `id`, if any."""
+        self._sync()
+        ret = self.positions.get(id)
+        if ret is not None and self.elements[ret].id != id:
+            # changed behind our back
+            self._rebuild()
+            return self.position(id)
+        return ret
+
+    def position_of(self, element: typing.Any) -> int | None:
+        self._sync()
+        ret = self.element_positions.get(id(element))
+        if ret is not None and self.elements[ret] is not element:
+            self._rebuild()
+            return self.position_of(element)
+        return ret
+
+    def set_id(self, element: typing.Any, id: str | None):
+        old = element.id
+        element.id = id
+        self.id_changed(element, old)
+
+    def id_changed(self, element: typing.Any, old: str | None):
+        id = element.id
+        if old is not None:
+            # the element may have hidden a duplicate, and freed a suffix
+            self._rebuild()
+            return
+        position = self.position_of(element)
+        if id is not None and position is not None:
+            if self.positions.setdefault(id, position) > position:
+                self.positions[id] = position
+
+    def allocate(self, prefix: str, *, start_from_one: bool = False) -> str:
+        """First id free in the list, `prefix` itself or suffixed by a number."""
+        if not start_from_one and self.position(prefix) is None:
+            return prefix
+        i = self.counters.get(prefix, 0)
+        while True:
+            i += 1
+            ret = f"{prefix}-{i}"
+            if self.position(ret) is None:
+                self.counters[prefix] = i
+                return ret
+
+
 @dataclasses.dataclass
 class ContextBase(threading.local, RuleSet):
     current_workflow: Workflow | None = None
     current_job: Job | None = None
     current_workflow_id: str | None = None
     current_job_id: str | None = None
+    # indexes of lists of elements with ids, by `id()` of the list
+    id_indexes: dict[int, _IdIndex] = dataclasses.field(default_factory=dict)
+
+    def id_index(self, elements: list) -> _IdIndex:
+        ret = self.id_indexes.get(id(elements))
+        if ret is None or ret.elements is not elements:
+            ret = self.id_indexes[id(elements)] = _IdIndex(elements)
+        return ret
+
+    def _step_position(self, id: str) -> int | None:
+        if not self.current_job or self.current_job.steps is None:
+            return None
+        return self.id_index(self.current_job.steps).position(id)
 
     def _knows_step_id(self, target: typing.Any, id: str) -> bool:
-        if not self.current_job:
+        position = self._step_position(id)
+        if position is None:
             return False
-        for s in self.current_job.steps:
-            if s is target:
-                return False
-            if s.id == id:
-                return True
-        return False
+        # steps only know the ones before them
+        target_position = self.id_index(self.current_job.steps).position_of(target)
+        return target_position is None or target_position > position
 
     def error(self, message: str):
         raise NotImplemented
@@ -196,7 +286,7 @@ class ContextBase(threading.local, RuleSet):
         output: str,
         **kwargs,
     ) -> bool:
-        step = next(s for s in self.current_job.steps if s.id == id)
+        step = self.current_job.steps[self._step_position(id)]
         return self.check(
             step.outputs and step.outputs and output in step.outputs.values(),
             f"`{output}` was not declared in step `{id}`, use `outputs()` to declare it",
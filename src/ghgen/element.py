@@ -1,4 +1,5 @@
 import dataclasses
+import functools
 import typing
 import types
 
@@ -24,10 +25,14 @@ class Element:
         return key
 
     def asdict(self) -> typing.Any:
+        # fields not set at construction are views on others, and reading them
+        # may have side effects
         return {
             self._key(k): asobj(v)
             for k, v in (
-                (f.name, getattr(self, f.name)) for f in dataclasses.fields(self)
+                (f.name, getattr(self, f.name))
+                for f in dataclasses.fields(self)
+                if f.init
             )
             if v is not None
         }
@@ -63,6 +68,29 @@ class Element:
         dataclasses.dataclass(cls)
 
 
+class _FieldInfo(typing.NamedTuple):
+    field: dataclasses.Field
+    # the declared type without `None`, i.e. what gets instantiated for the field
+    type: typing.Any
+
+
+@functools.cache
+def _field_table(cls: type[Element]) -> dict[str, _FieldInfo]:
+    """Fields of an `Element` class by name, computed once per class."""
+    ret = {}
+    for f in dataclasses.fields(cls):
+        t = f.type
+        if typing.get_origin(t) in (types.UnionType, typing.Union):
+            t = typing.get_args(t)[0]
+        ret[f.name] = _FieldInfo(f, t)
+    return ret
+
+
+@functools.cache
+def _fields_by_key(cls: type[Element]) -> dict[str, dataclasses.Field]:
+    return {cls._key(f.name): f for f in reversed(dataclasses.fields(cls))}
+
+
 def asobj(o: typing.Any):
     if Template is not None and isinstance(o, Template):
         return instantiate(o)
@@ -124,10 +152,10 @@ def fromobj[T](x: typing.Any, t: type[T]) -> T:
             raise ValueError(f"expected dict, got {type(x)}")
         if t.__subclasses__():
             return fromobj(x, typing.Union[*t.__subclasses__()])
-        fields = dataclasses.fields(t)
+        fields = _fields_by_key(t)
         args = {"yaml": x}
         for k, v in x.items():
-            f = next((f for f in fields if t._key(f.name) == k), None)
+            f = fields.get(k)
             if f is None:
                 raise ValueError(f"unknown configuration field {k} in {t.__name__}")
             args[f.name] = fromobj(v, f.type)
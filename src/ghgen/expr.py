@@ -1,8 +1,15 @@
+import contextvars
 import dataclasses
 import abc
 import functools
+import hashlib
+import inspect
+import json
+import os
+import pathlib
 import re
 import textwrap
+import threading
 import types
 import typing
 import warnings
@@ -18,6 +25,7 @@ except ImportError:  # Python < 3.14: t-strings unavailable, f-strings only
 from .types import RefTree
 
 _fstring_deprecation_emitted = False
+_fstring_deprecation_lock = threading.Lock()
 
 
 def _warn_fstring_deprecated() -> None:
@@ -28,7 +36,10 @@ def _warn_fstring_deprecated() -> None:
     global _fstring_deprecation_emitted
     if _fstring_deprecation_emitted or Template is None:
         return
-    _fstring_deprecation_emitted = True
+    with _fstring_deprecation_lock:
+        if _fstring_deprecation_emitted:
+            return
+        _fstring_deprecation_emitted = True
     warnings.warn(
         'interpolating contexts with f-strings is deprecated; use t-strings (t"...") instead',
         DeprecationWarning,
@@ -36,16 +47,50 @@ def _warn_fstring_deprecated() -> None:
     )
 
 
+class _Rendered(str):
+    """Syntax of an `Expr`, along with where refs start in it and their paths.
+
+    Refs are only marked with `\0` in the text when an `Expr` is interpolated in
+    an f-string, as that is the only way to track them in plain strings.
+    """
+
+    spans: tuple[tuple[int, tuple[str, ...]], ...]
+
+    def __new__(cls, text: str = "", spans: tuple = ()) -> typing.Self:
+        ret = super().__new__(cls, text)
+        ret.spans = spans
+        return ret
+
+    @classmethod
+    def concat(cls, *parts: str) -> typing.Self:
+        spans = []
+        offset = 0
+        for part in parts:
+            spans += ((offset + o, path) for o, path in getattr(part, "spans", ()))
+            offset += len(part)
+        return cls("".join(parts), tuple(spans))
+
+    def marked(self) -> str:
+        """The text with a `\0` marker at the start of each ref."""
+        parts = []
+        start = 0
+        for offset, _ in self.spans:
+            parts += (self[start:offset], "\0")
+            start = offset
+        parts.append(self[start:])
+        return "".join(parts)
+
+
 class Expr(abc.ABC):
     _precedence: int = 0
 
     @property
-    def _syntax(self) -> str: ...
+    def _syntax(self) -> _Rendered: ...
 
     @property
     def _formula(self) -> str:
-        """Returns the syntax of this `Expr` with ref markers removed"""
-        return self._syntax.replace("\0", "")
+        """Returns the syntax of this `Expr` as a plain string"""
+        return str(self._syntax)
 
     @property
     def _access(self) -> "Expr":
@@ -54,16 +99,20 @@ class Expr(abc.ABC):
     def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         yield from ()
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        raise ValueError(f"cannot evaluate `{self._formula}`")
+
     @staticmethod
     def _instantiate(x: typing.Any) -> typing.Any:
         if Template is not None and isinstance(x, Template):
             return Expr._render_template(x)
         match x:
             case Expr():
-                return str(x).replace("\0", "")
+                return f"${{{{ {x._formula} }}}}"
             case str():
-                if "\0" in x:
-                    _warn_fstring_deprecated()
+                if "\0" not in x:
+                    return x
+                _warn_fstring_deprecated()
                 return x.replace("\0", "")
             case dict():
                 return {
@@ -82,7 +131,7 @@ class Expr(abc.ABC):
             if isinstance(item, str):
                 parts.append(item)
             elif isinstance(item.value, Expr):
-                parts.append(str(item.value).replace("\0", ""))
+                parts.append(f"${{{{ {item.value._formula} }}}}")
             else:
                 parts.append(str(Expr._instantiate(item.value)))
         return "".join(parts)
@@ -116,8 +165,9 @@ class Expr(abc.ABC):
             case Expr() as e:
                 yield from e._get_paths()
             case str() as s:
-                if "\0" in s:
-                    _warn_fstring_deprecated()
+                if "\0" not in s:
+                    return
+                _warn_fstring_deprecated()
                 for m in re.finditer("\0([a-zA-Z0-9\\-_.]+)", s):
                     yield tuple(m[1].split("."))
             case dict():
@@ -136,17 +186,30 @@ class Expr(abc.ABC):
                     yield from Expr._paths(getattr(x, f.name))
 
     def __str__(self) -> str:
-        return f"${{{{ {self._syntax} }}}}"
+        # markers let refs be tracked through f-strings
+        return f"${{{{ {self._syntax.marked()} }}}}"
 
     def __repr__(self) -> str:
-        return self._instantiate(self._syntax)
+        return self._formula
 
-    def _as_operand(self, op_precedence: int) -> str:
+    def _as_operand(self, op_precedence: int) -> _Rendered:
         if self._precedence > op_precedence:
-            return f"({self._syntax})"
+            return _Rendered.concat("(", self._syntax, ")")
         return self._syntax
 
-    def _operand_from(self, e: "Expr") -> str:
+    def _same(self, other: typing.Any) -> bool:
+        """Structural equality, as `==` is taken for building `==` expressions.
+
+        Immutable nodes are interned, so structurally identical expressions are
+        the same object. Non-`Expr` values are compared as literals.
+        """
+        return self._access is self._coerce(other)
+
+    def _hash(self) -> int:
+        """Structural hash, consistent with `_same`."""
+        return id(self._access)
+
+    def _operand_from(self, e: "Expr") -> _Rendered:
         return e._as_operand(self._precedence)
 
     @staticmethod
@@ -213,8 +276,82 @@ instantiate = Expr._instantiate
 dedent_template = Expr._dedent_template
 
 
+def _intern_key(x: typing.Any) -> typing.Hashable:
+    """Structural key of a constructor argument of an interned `Expr` node.
+
+    Operands are interned themselves (or mutable, and then compared by
+    identity), so they are keyed by `id`: the node being keyed holds them alive.
+    Scalars are keyed by type as well, so that `1`, `1.0` and `True` stay
+    distinct, and floats by `repr` to tell `0.0` from `-0.0`. Unhashable values
+    (lists, dicts) raise `TypeError`: they may be mutated by whoever passed them,
+    so a node holding one is not shared.
+    """
+    match x:
+        case Expr():
+            return id(x)
+        case float():
+            return float, repr(x)
+        case _:
+            hash(x)
+            return type(x), x
+
+
+class _CachedExpr(Expr):
+    """Base of the immutable `Expr` nodes, memoizing their rendering and paths.
+
+    Composite expressions render and collect paths through their operands, so
+    without caching repeatedly rendering or validating a long `a & b & c & ...`
+    chain is quadratic. Subclasses implement `_render` and `_collect_paths`.
+
+    Nodes are also hash-consed: constructing a node structurally identical to
+    a live one returns that same instance, so the same condition written on
+    every step of a job is one shared node, with its caches computed once.
+    """
+
+    _interned: typing.ClassVar[weakref.WeakValueDictionary[tuple, "_CachedExpr"]] = (
+        weakref.WeakValueDictionary()
+    )
+    _interned_lock: typing.ClassVar[threading.Lock] = threading.Lock()
+
+    def __new__(cls, *args: typing.Any, **kwargs: typing.Any):
+        try:
+            key = (
+                cls,
+                *map(_intern_key, args),
+                *((k, _intern_key(v)) for k, v in kwargs.items()),
+            )
+        except TypeError:
+            return super().__new__(cls)
+        with _CachedExpr._interned_lock:
+            _instance = _CachedExpr._interned.get(key)
+            if _instance is None:
+                _instance = super().__new__(cls)
+                _CachedExpr._interned[key] = _instance
+        return _instance
+
+    def _render(self) -> _Rendered: ...
+
+    def _collect_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
+        yield from ()
+
+    @functools.cached_property
+    def _syntax(self) -> _Rendered:
+        return self._render()
+
+    @functools.cached_property
+    def _formula(self) -> str:
+        return str(self._syntax)
+
+    @functools.cached_property
+    def _collected_paths(self) -> tuple[tuple[str, ...], ...]:
+        return tuple(self._collect_paths())
+
+    def _get_paths(self) -> typing.Iterator[tuple[str, ...]]:
+        return iter(self._collected_paths)
+
+
 @dataclasses.dataclass(frozen=True, eq=False, repr=False)
-class _RootRewrite(Expr):
+class _RootRewrite(_CachedExpr):
     """`Expr` wrapper that rewrites the leading segment of each ref it wraps.
 
     Stays an `Expr` (rather than collapsing to a marker string) so rendering
@@ -225,17 +362,35 @@ class _RootRewrite(Expr):
     _from_root: str
     _to_root: str
 
-    @property
-    def _syntax(self) -> str:
-        return self._inner._syntax.replace(f"\0{self._from_root}", f"\0{self._to_root}")
+    def _render(self) -> _Rendered:
+        inner = self._inner._syntax
+        parts = []
+        spans = []
+        start = 0
+        shift = 0
+        for offset, path in inner.spans:
+            if path[:1] == (self._from_root,):
+                parts += (inner[start:offset], self._to_root)
+                start = offset + len(self._from_root)
+                spans.append((offset + shift, (self._to_root, *path[1:])))
+                shift += len(self._to_root) - len(self._from_root)
+            else:
+                spans.append((offset + shift, path))
+        parts.append(inner[start:])
+        return _Rendered("".join(parts), tuple(spans))
 
-    def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
+    def _collect_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         for path in self._inner._get_paths():
             if path[:1] == (self._from_root,):
                 yield (self._to_root, *path[1:])
             else:
                 yield path
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        context = evaluation.context
+        context = {**context, self._from_root: _index(context, self._to_root)}
+        return self._inner._evaluate(dataclasses.replace(evaluation, context=context))
+
 
 def rewrite_ref_root(value: typing.Any, from_root: str, to_root: str) -> typing.Any:
     """Rewrite the leading ref segment of every context in `value`.
@@ -262,8 +417,13 @@ def rewrite_ref_root(value: typing.Any, from_root: str, to_root: str) -> typing.
                     )
                 )
         return Template(*parts)
-    if isinstance(value, str):
-        return value.replace(f"\0{from_root}", f"\0{to_root}")
+    if isinstance(value, str) and "\0" in value:
+        # only whole root segments: `needs` is not the root of `needsmore`
+        return re.sub(
+            f"\0{re.escape(from_root)}(?![a-zA-Z0-9\\-_])",
+            lambda _: f"\0{to_root}",
+            value,
+        )
     return value
 
 
@@ -284,6 +444,7 @@ class RefExpr(Expr):
     _store: typing.ClassVar[dict[tuple[str, ...], weakref.ReferenceType["RefExpr"]]] = (
         {}
     )
+    _store_lock: typing.ClassVar[threading.Lock] = threading.Lock()
 
     @classmethod
     def _get(cls, *args: str) -> typing.Optional["RefExpr"]:
@@ -292,16 +453,17 @@ class RefExpr(Expr):
     def __new__(cls, *args: str, **kwargs: typing.Any):
         # for some reason local variables here pollute PyCharm's autocomplete, use `_` prefix to
         # avoid that
-        _ref = cls._get(*args)
-        if _ref is not None:
-            assert isinstance(
-                _ref, cls
-            ), f"{type(_ref).__name__}({", ".join(map(repr, args))}) was created before this {cls.__name__}"
-            return _ref
-        cls._store.pop(args, None)
-        _instance = super().__new__(cls)
-        cls._store[args] = weakref.ref(_instance)
-        return _instance
+        with cls._store_lock:
+            _ref = cls._get(*args)
+            if _ref is not None:
+                assert isinstance(
+                    _ref, cls
+                ), f"{type(_ref).__name__}({", ".join(map(repr, args))}) was created before this {cls.__name__}"
+                return _ref
+            cls._store.pop(args, None)
+            _instance = super().__new__(cls)
+            cls._store[args] = weakref.ref(_instance)
+            return _instance
 
     def __init__(self, *args: str):
         super().__init__()
@@ -311,13 +473,19 @@ class RefExpr(Expr):
     def _path(self) -> str:
         return ".".join(self._segments)
 
-    @property
-    def _syntax(self) -> str:
-        return f"\0{self._path}"
+    @functools.cached_property
+    def _syntax(self) -> _Rendered:
+        return _Rendered(self._path, ((0, self._segments),))
 
     def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         yield self._segments
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        ret = evaluation.context
+        for segment in self._segments:
+            ret = _filter(ret) if segment == "*" else _index(ret, segment)
+        return ret
+
     def __getattr__(self, name) -> Expr:
         if name == "_":
             if self._child_factory:
@@ -389,20 +557,320 @@ _op_precedence = (
 )
 _op_precedence = {op: i for i, ops in enumerate(_op_precedence) for op in ops}
 
+# Value semantics of Actions expressions, with `None`, `bool`, `int`/`float`, `str`,
+# `list` and `dict` standing for null, booleans, numbers, strings, arrays and objects.
+
+_number_regex = re.compile(r"[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?")
+_hex_number_regex = re.compile(r"[-+]?0x[0-9a-fA-F]+")
+
+
+def _truthy(value: typing.Any) -> bool:
+    """`false`, `0`, `-0`, `NaN`, `''` and `null` are falsy, anything else is truthy."""
+    match value:
+        case None | False:
+            return False
+        case int() | float():
+            return value == value and value != 0
+        case str():
+            return value != ""
+        case _:
+            return True
+
+
+def _kind(value: typing.Any) -> str:
+    match value:
+        case None:
+            return "null"
+        case bool():
+            return "boolean"
+        case int() | float():
+            return "number"
+        case str():
+            return "string"
+        case list():
+            return "array"
+        case _:
+            return "object"
+
+
+def _to_number(value: typing.Any) -> float:
+    """Number coercion applied when comparing values of different types."""
+    match value:
+        case None:
+            return 0.0
+        case bool() | int() | float():
+            return float(value)
+        case str():
+            s = value.strip()
+            if not s:
+                return 0.0
+            if _hex_number_regex.fullmatch(s):
+                return float(int(s, 16))
+            if _number_regex.fullmatch(s):
+                return float(s)
+            return float("nan")
+        case _:
+            return float("nan")
+
+
+def _loose_equals(lhs: typing.Any, rhs: typing.Any) -> bool:
+    """Equality with type coercion to numbers, and case-insensitive on strings."""
+    kind = _kind(lhs)
+    if kind != _kind(rhs):
+        return _to_number(lhs) == _to_number(rhs)
+    match kind:
+        case "string":
+            return lhs.casefold() == rhs.casefold()
+        case "number":
+            return float(lhs) == float(rhs)
+        case "array" | "object":
+            return lhs is rhs
+        case _:
+            return lhs == rhs
+
+
+def _compare(op: str, lhs: typing.Any, rhs: typing.Any) -> bool:
+    match op:
+        case "==":
+            return _loose_equals(lhs, rhs)
+        case "!=":
+            return not _loose_equals(lhs, rhs)
+    if _kind(lhs) == _kind(rhs) == "string":
+        lhs, rhs = lhs.casefold(), rhs.casefold()
+    else:
+        lhs, rhs = _to_number(lhs), _to_number(rhs)
+    match op:
+        case "<":
+            return lhs < rhs
+        case "<=":
+            return lhs <= rhs
+        case ">":
+            return lhs > rhs
+        case ">=":
+            return lhs >= rhs
+    assert False, f"unexpected operator `{op}`"
+
+
+def _to_string(value: typing.Any) -> str:
+    """String coercion, used by string functions and `format`."""
+    match value:
+        case None:
+            return ""
+        case bool():
+            return "true" if value else "false"
+        case float() if value != value:
+            return "NaN"
+        case float() if value in (float("inf"), float("-inf")):
+            return "Infinity" if value > 0 else "-Infinity"
+        case float() if value.is_integer():
+            return str(int(value))
+        case int() | float() | str():
+            return str(value)
+        case list():
+            return "Array"
+        case _:
+            return "Object"
+
+
+@dataclasses.dataclass(frozen=True)
+class _Unknown:
+    """A value only known at run time, possibly with known truthiness.
+
+    Contexts may hold it to evaluate expressions partially: anything depending
+    on it evaluates to an unknown as well.
+    """
+
+    truthy: bool | None = None
+
+
+_unknown = _Unknown()
+
+
+def _truth(value: typing.Any) -> bool | None:
+    """Truthiness of `value`, `None` if it cannot be known before run time."""
+    if isinstance(value, _Unknown):
+        return value.truthy
+    return _truthy(value)
+
+
+class _Filtered(list):
+    """Result of a `*` filter: further property accesses apply to each element."""
+
+
+def _filter(value: typing.Any) -> _Filtered | _Unknown:
+    match value:
+        case _Unknown():
+            return _unknown
+        case _Filtered():
+            return _Filtered(x for v in value for x in _filter(v))
+        case list():
+            return _Filtered(value)
+        case dict():
+            return _Filtered(value.values())
+        case _:
+            return _Filtered()
+
+
+def _index(value: typing.Any, key: typing.Any) -> typing.Any:
+    """Property or index access, `null` where there is nothing to access."""
+    if isinstance(value, _Unknown) or isinstance(key, _Unknown):
+        return _unknown
+    match value:
+        case _Filtered():
+            return _Filtered(x for v in value if (x := _index(v, key)) is not None)
+        case dict() if isinstance(key, str):
+            if key in value:
+                return value[key]
+            key = key.casefold()
+            return next(
+                (
+                    v
+                    for k, v in value.items()
+                    if isinstance(k, str) and k.casefold() == key
+                ),
+                None,
+            )
+        case list() if _kind(key) == "number" and float(key).is_integer():
+            key = int(key)
+            return value[key] if 0 <= key < len(value) else None
+        case _:
+            return None
+
+
+@dataclasses.dataclass(frozen=True)
+class _Evaluation:
+    context: dict[str, typing.Any]
+    workspace: pathlib.Path | None
+
+    @property
+    def status(self) -> "str | _Unknown":
+        return _index(_index(self.context, "job"), "status") or "success"
+
+    def hash_files(self, *patterns: typing.Any) -> str:
+        workspace = self.workspace or _index(
+            _index(self.context, "github"), "workspace"
+        )
+        if isinstance(workspace, _Unknown):
+            return _unknown
+        if not workspace:
+            raise ValueError("`hashFiles` needs a workspace to look for files in")
+        workspace = pathlib.Path(workspace)
+        files = set()
+        for pattern in map(_to_string, patterns):
+            # later patterns starting with `!` exclude files matched so far
+            exclude = pattern.startswith("!")
+            matched = {
+                f for f in workspace.glob(pattern.removeprefix("!")) if f.is_file()
+            }
+            files = files - matched if exclude else files | matched
+        if not files:
+            return ""
+        h = hashlib.sha256()
+        for f in sorted(files):
+            h.update(hashlib.sha256(f.read_bytes()).digest())
+        return h.hexdigest()
+
+
+def _format(fmt: typing.Any, *args: typing.Any) -> str:
+    fmt = _to_string(fmt)
+
+    def replace(m: re.Match) -> str:
+        match m[0]:
+            case "{{":
+                return "{"
+            case "}}":
+                return "}"
+        if m[1] is None or int(m[1]) >= len(args):
+            raise ValueError(f"invalid format string {fmt!r} for {len(args)} arguments")
+        return _to_string(args[int(m[1])])
+
+    return re.sub(r"\{\{|\}\}|\{(\d+)\}|[{}]", replace, fmt)
+
+
+def _contains(search: typing.Any, item: typing.Any) -> bool:
+    if isinstance(search, list):
+        return any(_loose_equals(x, item) for x in search)
+    return _to_string(item).casefold() in _to_string(search).casefold()
+
+
+def _starts_with(s: typing.Any, prefix: typing.Any) -> bool:
+    return _to_string(s).casefold().startswith(_to_string(prefix).casefold())
+
+
+def _ends_with(s: typing.Any, suffix: typing.Any) -> bool:
+    return _to_string(s).casefold().endswith(_to_string(suffix).casefold())
+
+
+def _join(array: typing.Any, separator: typing.Any) -> str:
+    if isinstance(array, list):
+        return _to_string(separator).join(map(_to_string, array))
+    return _to_string(array)
+
+
+def _status_is(status: str | _Unknown, expected: str) -> bool | _Unknown:
+    return status if isinstance(status, _Unknown) else status == expected
+
+
+# functions by case-folded name, taking the evaluation and the argument values
+_functions: dict[str, typing.Callable[..., typing.Any]] = {
+    "always": lambda ev: True,
+    "success": lambda ev: _status_is(ev.status, "success"),
+    "failure": lambda ev: _status_is(ev.status, "failure"),
+    "cancelled": lambda ev: _status_is(ev.status, "cancelled"),
+    "contains": lambda ev, search, item: _contains(search, item),
+    "startswith": lambda ev, s, prefix: _starts_with(s, prefix),
+    "endswith": lambda ev, s, suffix: _ends_with(s, suffix),
+    "format": lambda ev, fmt, *args: _format(fmt, *args),
+    "join": lambda ev, array, separator=",": _join(array, separator),
+    "tojson": lambda ev, value: json.dumps(value, indent=2),
+    "fromjson": lambda ev, value: json.loads(_to_string(value)),
+    "hashfiles": lambda ev, *patterns: ev.hash_files(*patterns),
+}
+
+
+def evaluate(
+    e: Value,
+    context: dict[str, typing.Any] | None = None,
+    *,
+    workspace: str | os.PathLike | None = None,
+) -> typing.Any:
+    """Compute the value of `e` the way the Actions runner would.
+
+    `context` maps context names (`github`, `matrix`, `inputs`, ...) to their
+    values, as `None`, `bool`, numbers, `str`, `list` and `dict`. Missing
+    properties evaluate to `null`, as on the runner. Status check functions look
+    at `job.status` (`"success"` if not given), and `hashFiles` at the files in
+    `workspace` (or `github.workspace`).
+
+    Raises `ValueError` on expressions the runner would fail on.
+    """
+    if workspace is not None:
+        workspace = pathlib.Path(workspace)
+    evaluation = _Evaluation(context or {}, workspace)
+    ret = Expr._coerce(e)._evaluate(evaluation)
+    return list(ret) if isinstance(ret, _Filtered) else ret
+
 
 @dataclasses.dataclass(frozen=True, eq=False, repr=False)
-class LiteralExpr[T](Expr):
+class LiteralExpr[T](_CachedExpr):
     _value: T
 
-    @property
-    def _syntax(self) -> str:
-        if isinstance(self._value, str):
-            return f"'{self._value.replace("'", "''")}'"
-        return repr(self._value)
+    def _render(self) -> _Rendered:
+        match self._value:
+            case str():
+                return _Rendered(f"'{self._value.replace("'", "''")}'")
+            case bool():
+                return _Rendered("true" if self._value else "false")
+            case None:
+                return _Rendered("null")
+        return _Rendered(repr(self._value))
+
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        return self._value
 
 
 @dataclasses.dataclass(frozen=True, eq=False, repr=False)
-class BinOpExpr(Expr):
+class BinOpExpr(_CachedExpr):
     _left: Expr
     _right: Expr
     _op: str
@@ -411,33 +879,60 @@ class BinOpExpr(Expr):
     def _precedence(self) -> int:
         return _op_precedence[self._op]
 
-    @property
-    def _syntax(self) -> str:
-        return f"{self._operand_from(self._left)} {self._op} {self._operand_from(self._right)}"
+    def _render(self) -> _Rendered:
+        return _Rendered.concat(
+            self._operand_from(self._left),
+            f" {self._op} ",
+            self._operand_from(self._right),
+        )
 
-    def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
+    def _collect_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         yield from self._left._get_paths()
         yield from self._right._get_paths()
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        lhs = self._left._evaluate(evaluation)
+        if self._op not in ("&&", "||"):
+            rhs = self._right._evaluate(evaluation)
+            if isinstance(lhs, _Unknown) or isinstance(rhs, _Unknown):
+                return _unknown
+            return _compare(self._op, lhs, rhs)
+        is_and = self._op == "&&"
+        match _truth(lhs):
+            case None:
+                # either operand can be the value, so only agreeing truthiness
+                # of the right one is known
+                rhs = self._right._evaluate(evaluation)
+                if _truth(rhs) is (not is_and):
+                    return _Unknown(not is_and)
+                return _unknown
+            case truthy if truthy is is_and:
+                return self._right._evaluate(evaluation)
+            case _:
+                return lhs
+
 
 @dataclasses.dataclass(frozen=True, eq=False, repr=False)
-class NotExpr(Expr):
+class NotExpr(_CachedExpr):
     _expr: Expr
 
     @property
     def _precedence(self) -> int:
         return _op_precedence["!"]
 
-    @property
-    def _syntax(self) -> str:
-        return f"!{self._operand_from(self._expr)}"
+    def _render(self) -> _Rendered:
+        return _Rendered.concat("!", self._operand_from(self._expr))
 
-    def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
+    def _collect_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         yield from self._expr._get_paths()
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        truthy = _truth(self._expr._evaluate(evaluation))
+        return _unknown if truthy is None else not truthy
+
 
 @dataclasses.dataclass(frozen=True, eq=False, repr=False)
-class ItemExpr(Expr):
+class ItemExpr(_CachedExpr):
     _expr: Expr
     _index: Expr
 
@@ -445,30 +940,39 @@ class ItemExpr(Expr):
     def _precedence(self) -> int:
         return _op_precedence["[]"]
 
-    @property
-    def _syntax(self) -> str:
-        return f"{self._operand_from(self._expr)}[{self._index._syntax}]"
+    def _render(self) -> _Rendered:
+        return _Rendered.concat(
+            self._operand_from(self._expr), "[", self._index._syntax, "]"
+        )
 
-    def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
+    def _collect_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         yield from self._expr._get_paths()
         yield from self._index._get_paths()
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        return _index(
+            self._expr._evaluate(evaluation), self._index._evaluate(evaluation)
+        )
+
 
 @dataclasses.dataclass(frozen=True, eq=False, repr=False)
-class DotExpr(Expr):
+class DotExpr(_CachedExpr):
     _expr: Expr
     _attr: str
 
-    @property
-    def _syntax(self) -> str:
-        return f"{self._operand_from(self._expr)}.{self._attr}"
+    def _render(self) -> _Rendered:
+        return _Rendered.concat(self._operand_from(self._expr), f".{self._attr}")
 
-    def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
+    def _collect_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         yield from self._expr._get_paths()
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        value = self._expr._evaluate(evaluation)
+        return _filter(value) if self._attr == "*" else _index(value, self._attr)
+
 
 @dataclasses.dataclass(frozen=True, eq=False, repr=False)
-class CallExpr(Expr):
+class CallExpr(_CachedExpr):
     _function: str
     _args: tuple[Expr, ...]
 
@@ -477,14 +981,34 @@ class CallExpr(Expr):
         object.__setattr__(self, "_function", function)
         object.__setattr__(self, "_args", args)
 
-    @property
-    def _syntax(self) -> str:
-        return f"{self._function}({', '.join(a._syntax for a in self._args)})"
+    def _render(self) -> _Rendered:
+        parts = [f"{self._function}("]
+        for i, a in enumerate(self._args):
+            if i:
+                parts.append(", ")
+            parts.append(a._syntax)
+        parts.append(")")
+        return _Rendered.concat(*parts)
 
-    def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
+    def _collect_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         for a in self._args:
             yield from a._get_paths()
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        f = _functions.get(self._function.casefold())
+        if f is None:
+            raise ValueError(f"unknown function `{self._function}`")
+        args = [a._evaluate(evaluation) for a in self._args]
+        if any(isinstance(a, _Unknown) for a in args):
+            return _unknown
+        try:
+            inspect.signature(f).bind(evaluation, *args)
+        except TypeError:
+            raise ValueError(
+                f"wrong number of arguments to `{self._function}`: {len(args)}"
+            ) from None
+        return f(evaluation, *args)
+
 
 @dataclasses.dataclass(eq=False)
 class ProxyExpr(Expr):
@@ -500,12 +1024,15 @@ class ProxyExpr(Expr):
         return self._filled_expr
 
     @property
-    def _syntax(self) -> str:
+    def _syntax(self) -> _Rendered:
         return self._access._syntax
 
     def _get_paths(self) -> typing.Generator[tuple[str, ...], None, None]:
         return self._access._get_paths()
 
+    def _evaluate(self, evaluation: "_Evaluation") -> typing.Any:
+        return self._access._evaluate(evaluation)
+
     def __getattr__(self, item: str) -> typing.Any:
         if item in ("_access", "_syntax"):  # why is this necessary?
             return getattr(ProxyExpr, item).__get__(self)
@@ -528,7 +1055,7 @@ class ErrorExpr(Expr):
         return self
 
     @property
-    def _syntax(self) -> str:
+    def _syntax(self) -> _Rendered:
         self._emit()
         e: Expr = CallExpr("error", self._coerce(self._error))
         return e._syntax
@@ -596,16 +1123,24 @@ def function(
     return ret
 
 
-def _current_on_error(message: str) -> None:
+def _raise_error(message: str) -> None:
     raise ValueError(message)
 
 
+# scoped per thread (and per asyncio task), as workflows may be built concurrently
+_on_error: contextvars.ContextVar[typing.Callable[[str], typing.Any]] = (
+    contextvars.ContextVar("on_error", default=_raise_error)
+)
+
+
+def _current_on_error(message: str) -> None:
+    _on_error.get()(message)
+
+
 @contextlib.contextmanager
 def on_error(handler: typing.Callable[[str], typing.Any]):
-    global _current_on_error
-    old_error = _current_on_error
-    _current_on_error = handler
+    token = _on_error.set(handler)
     try:
         yield
     finally:
-        _current_on_error = old_error
+        _on_error.reset(token)
@@ -0,0 +1,649 @@
+"""Timing of the phases of a run, reported with `--timings` or traced with `--trace`.
+
+Code marks its phases with `phase()` (or `timed()` for whole functions), which
+costs next to nothing unless timings or a trace are being collected. Phases
+nest: each one is accounted its own time, without the time of the phases it
+contains, so that the times of all phases add up to the time of the run. Phases
+are also accounted to a source, like the workflow file being loaded or built,
+which nested phases inherit.
+
+Finer parts of a phase, like the jobs of a workflow, are marked with `span()`:
+they only show in traces, which are written in the Chrome trace event format
+read by Perfetto and `chrome://tracing`.
+
+With `--profile`, the phases running workflow code are profiled as well, telling
+the time spent in workflow code from the time spent in ghgen. With
+`--memory-report`, the memory used by building and serializing each workflow is
+reported.
+"""
+
+import collections
+import contextlib
+import cProfile
+import dataclasses
+import functools
+import gc
+import json
+import logging
+import os
+import pathlib
+import pstats
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+import typing
+
+
+@dataclasses.dataclass
+class _Frame:
+    name: str
+    source: str | None
+    start: float
+    # time spent in nested phases
+    nested: float = 0.0
+
+
+class Timings:
+    """Time spent per phase, and per phase and source, over all threads."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: dict[str, list] = {}
+        self.sources: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> list[_Frame]:
+        ret = getattr(self._local, "stack", None)
+        if ret is None:
+            ret = self._local.stack = []
+        return ret
+
+    def enter(self, name: str, source: str | None, args: dict[str, typing.Any]):
+        stack = self._stack()
+        if source is None and stack:
+            source = stack[-1].source
+        stack.append(_Frame(name, source, time.perf_counter()))
+
+    def exit(self):
+        stack = self._stack()
+        frame = stack.pop()
+        elapsed = time.perf_counter() - frame.start
+        if stack:
+            stack[-1].nested += elapsed
+        spent = elapsed - frame.nested
+        with self._lock:
+            entry = self.phases.setdefault(frame.name, [0.0, 0])
+            entry[0] += spent
+            entry[1] += 1
+            if frame.source is not None:
+                by_phase = self.sources.setdefault(frame.source, {})
+                by_phase[frame.name] = by_phase.get(frame.name, 0.0) + spent
+
+    def asdict(self) -> dict[str, typing.Any]:
+        total = time.perf_counter() - self.start
+        return {
+            "total": total,
+            "phases": {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in self.phases.items()
+            },
+            "sources": self.sources,
+        }
+
+    def table(self) -> list[str]:
+        """A report of the phases, then of the sources, longest first."""
+        data = self.asdict()
+        total = data["total"]
+        other = total - sum(p["seconds"] for p in data["phases"].values())
+        phases = sorted(data["phases"].items(), key=lambda p: -p[1]["seconds"])
+        width = max([len(name) for name, _ in phases] + [len("other")])
+        ret = [f"{'phase':<{width}}  {'calls':>7}  {'seconds':>9}  {'share':>6}"]
+        for name, p in phases + [("other", {"seconds": other, "calls": None})]:
+            calls = "" if p["calls"] is None else p["calls"]
+            ret.append(
+                f"{name:<{width}}  {calls:>7}  {p['seconds']:>9.3f}  {p['seconds'] / total:>6.1%}"
+            )
+        ret.append(f"{'total':<{width}}  {'':>7}  {total:>9.3f}")
+        sources = sorted(data["sources"].items(), key=lambda s: -sum(s[1].values()))
+        if sources:
+            ret.append("")
+            for source, by_phase in sources:
+                details = ", ".join(
+                    f"{name} {seconds:.3f}"
+                    for name, seconds in sorted(by_phase.items(), key=lambda p: -p[1])
+                )
+                ret.append(
+                    f"{_display(source)}: {sum(by_phase.values()):.3f}s ({details})"
+                )
+        return ret
+
+
+def _display(source: str) -> str:
+    path = pathlib.Path(source)
+    if path.is_absolute():
+        with contextlib.suppress(ValueError):
+            return str(path.relative_to(pathlib.Path.cwd()))
+    return source
+
+
+class Trace:
+    """Phases and spans as complete events of the Chrome trace event format."""
+
+    def __init__(self):
+        self.start = time.perf_counter_ns()
+        self.events: list[dict[str, typing.Any]] = []
+        self._threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> list[tuple]:
+        ret = getattr(self._local, "stack", None)
+        if ret is None:
+            ret = self._local.stack = []
+        return ret
+
+    def enter(self, name: str, source: str | None, args: dict[str, typing.Any]):
+        self._stack().append((name, source, args, time.perf_counter_ns()))
+
+    def exit(self):
+        end = time.perf_counter_ns()
+        name, source, args, start = self._stack().pop()
+        if source is not None:
+            args = {"source": _display(source), **args}
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": "ghgen",
+            "ph": "X",
+            "ts": (start - self.start) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": {k: str(v) for k, v in args.items()},
+        }
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+    def asdict(self) -> dict[str, typing.Any]:
+        names = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in self._threads.items()
+        ]
+        return {"traceEvents": names + self.events, "displayTimeUnit": "ms"}
+
+
+def _attribution(filename: str) -> str:
+    """Whose code `filename` is: ghgen's, a library's or the user's."""
+    from .syntax import _is_internal
+
+    if _is_internal(filename):
+        return "ghgen"
+    if filename.startswith(("<", "~")) or any(
+        filename.startswith(p) for p in _library_paths()
+    ):
+        return "libraries"
+    return "workflow code"
+
+
+@functools.cache
+def _library_paths() -> tuple[str, ...]:
+    paths = sysconfig.get_paths()
+    return tuple(
+        {paths[k] for k in ("stdlib", "platstdlib", "purelib", "platlib") if k in paths}
+    )
+
+
+class _Hook:
+    """Runs `start()` and `stop()` around the phases in `phases`.
+
+    Hooks run in one thread at a time, and not around phases nested in one they
+    already run around.
+    """
+
+    phases: typing.ClassVar[frozenset[str]]
+
+    def __init__(self):
+        self._owner: int | None = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> list[bool]:
+        ret = getattr(self._local, "stack", None)
+        if ret is None:
+            ret = self._local.stack = []
+        return ret
+
+    def enter(self, name: str, source: str | None, args: dict[str, typing.Any]):
+        started = False
+        if name in self.phases:
+            with self._lock:
+                if self._owner is None:
+                    self._owner = threading.get_ident()
+                    started = True
+        if started:
+            self.start(name, source, args)
+        self._stack().append(started)
+
+    def exit(self):
+        if self._stack().pop():
+            self.stop()
+            with self._lock:
+                self._owner = None
+
+    def start(self, name: str, source: str | None, args: dict[str, typing.Any]): ...
+
+    def stop(self): ...
+
+
+class _Profiler(_Hook):
+    """Runs a profiler in the phases executing workflow code.
+
+    Those are module execution and workflow building.
+    """
+
+    phases = frozenset(("exec", "build"))
+
+    def write(self, file: pathlib.Path): ...
+
+    def attribution(self) -> dict[str, float]:
+        """Share of the profiled time per `_attribution()` of the code."""
+        ...
+
+
+class _CProfiler(_Profiler):
+    """Deterministic profiling with `cProfile`, written as `pstats` data."""
+
+    def __init__(self):
+        super().__init__()
+        self.profile = cProfile.Profile()
+
+    def start(self, *phase):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, file: pathlib.Path):
+        self.profile.dump_stats(file)
+
+    def attribution(self) -> dict[str, float]:
+        # the own time of library functions goes to their callers, in
+        # proportion to the time spent in them from each caller
+        stats = pstats.Stats(self.profile).stats
+        shares: dict[tuple, dict[str, float]] = {}
+
+        def share(func: tuple, seen: frozenset) -> dict[str, float]:
+            if func in shares:
+                return shares[func]
+            kind = _attribution(func[0])
+            callers = stats[func][4] if func in stats else {}
+            total = sum(ct for _, _, _, ct in callers.values())
+            if kind != "libraries" or not total or func in seen:
+                return {kind: 1.0}
+            ret = {}
+            for caller, (_, _, _, ct) in callers.items():
+                for k, f in share(caller, seen | {func}).items():
+                    ret[k] = ret.get(k, 0.0) + f * ct / total
+            shares[func] = ret
+            return ret
+
+        ret = {}
+        for func, (_, _, tt, _, _) in stats.items():
+            for kind, f in share(func, frozenset()).items():
+                ret[kind] = ret.get(kind, 0.0) + f * tt
+        return ret
+
+
+class _Sampler(_Profiler):
+    """Sampling of the stack of the profiled thread, written as collapsed stacks.
+
+    Each sample is accounted to its innermost frame that is not library code,
+    as libraries are called by either ghgen or workflow code.
+    """
+
+    interval = 0.001
+
+    def __init__(self):
+        super().__init__()
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self.samples: collections.Counter[str] = collections.Counter()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self, *phase):
+        target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample, args=(target,), name="ghgen-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self, target: int):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            frames = []
+            kind = None
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_qualname} ({_display(code.co_filename)})")
+                if kind is None:
+                    kind = _attribution(code.co_filename)
+                    if kind == "libraries":
+                        kind = None
+                frame = frame.f_back
+            self.stacks[";".join(reversed(frames))] += 1
+            self.samples[kind or "libraries"] += 1
+
+    def write(self, file: pathlib.Path):
+        with open(file, "w") as out:
+            for stack, count in self.stacks.items():
+                out.write(f"{stack} {count}\n")
+
+    def attribution(self) -> dict[str, float]:
+        return {k: n * self.interval for k, n in self.samples.items()}
+
+
+def _size(n: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            break
+        n /= 1024
+    else:
+        unit = "GiB"
+    return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+
+
+class _PhaseMemory(typing.NamedTuple):
+    phase: str
+    workflow: str
+    peak: int
+    retained: int
+    # count and size of new objects still alive at the end, by type name
+    types: dict[str, tuple[int, int]]
+
+
+class _MemoryReport(_Hook):
+    """Peak and retained memory of building and serializing each workflow.
+
+    Retained memory is what is still allocated once the phase is over, after a
+    garbage collection, and is broken down by the type of the objects created
+    during the phase that are still alive, with their shallow sizes. Strings
+    are not tracked by the garbage collector: those referenced by new objects
+    are counted instead.
+    """
+
+    phases = frozenset(("build", "asdict", "yaml"))
+
+    def __init__(self):
+        super().__init__()
+        self.phases_memory: list[_PhaseMemory] = []
+        self._started_tracing = False
+
+    def begin(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def end(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def start(self, name: str, source: str | None, args: dict[str, typing.Any]):
+        self._phase = name
+        self._workflow = str(args.get("id", source))
+        gc.collect()
+        # kept alive, so that new objects cannot reuse their ids
+        self._before = gc.get_objects()
+        self._start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def stop(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        before = {id(o) for o in self._before}
+        before.update((id(self._before), id(before)))
+        new = [o for o in gc.get_objects() if id(o) not in before]
+        del self._before, before
+        types: dict[str, tuple[int, int]] = {}
+
+        def count(o: typing.Any):
+            name = type(o).__name__
+            n, size = types.get(name, (0, 0))
+            types[name] = n + 1, size + sys.getsizeof(o)
+
+        strings = {}
+        for o in new:
+            count(o)
+            for r in gc.get_referents(o):
+                if type(r) is str:
+                    strings[id(r)] = r
+        for o in strings.values():
+            count(o)
+        self.phases_memory.append(
+            _PhaseMemory(
+                self._phase,
+                self._workflow,
+                peak - self._start,
+                retained - self._start,
+                types,
+            )
+        )
+
+    def table(self) -> list[str]:
+        from .expr import RefExpr, _CachedExpr
+
+        ret = ["memory per workflow phase (peak, retained, largest retained types)"]
+        for m in self.phases_memory:
+            largest = sorted(m.types.items(), key=lambda t: -t[1][1])[:10]
+            types = ", ".join(
+                f"{name} {n}× {_size(size)}" for name, (n, size) in largest
+            )
+            ret.append(
+                f"{m.workflow} {m.phase}: {_size(m.peak)}, {_size(m.retained)}"
+                + (f" ({types})" if types else "")
+            )
+        store = list(RefExpr._store.values())
+        dead = sum(1 for r in store if r() is None)
+        ret.append(
+            f"RefExpr._store: {len(store)} entries, {dead} of them dead weak references"
+        )
+        ret.append(f"_CachedExpr._interned: {len(_CachedExpr._interned)} live nodes")
+        ret.append(f"peak over the run: {_size(tracemalloc.get_traced_memory()[1])}")
+        return ret
+
+
+# what phases are reported to, and the subset of it spans are reported to
+_recorders: tuple[Timings | Trace | _Hook, ...] = ()
+_tracers: tuple[Trace, ...] = ()
+
+
+class _Phase:
+    __slots__ = ("recorders", "name", "source", "args")
+
+    def __init__(
+        self,
+        recorders: tuple,
+        name: str,
+        source: str | os.PathLike | None,
+        args: dict[str, typing.Any],
+    ):
+        self.recorders = recorders
+        self.name = name
+        self.source = None if source is None else os.fspath(source)
+        self.args = args
+
+    def __enter__(self):
+        for r in self.recorders:
+            r.enter(self.name, self.source, self.args)
+
+    def __exit__(self, *args):
+        for r in reversed(self.recorders):
+            r.exit()
+
+
+_off = contextlib.nullcontext()
+
+
+def phase(
+    name: str, source: str | os.PathLike | None = None, **args: typing.Any
+) -> contextlib.AbstractContextManager:
+    """Account the time spent in this context to `name`, and to `source` if given.
+
+    `args` are only shown in traces.
+    """
+    recorders = _recorders
+    if not recorders:
+        return _off
+    return _Phase(recorders, name, source, args)
+
+
+def span(
+    name: str, source: str | os.PathLike | None = None, **args: typing.Any
+) -> contextlib.AbstractContextManager:
+    """Like `phase()`, but only shown in traces and not in timings."""
+    tracers = _tracers
+    if not tracers:
+        return _off
+    return _Phase(tracers, name, source, args)
+
+
+def timed[**P, R](
+    name: str,
+) -> typing.Callable[[typing.Callable[P, R]], typing.Callable[P, R]]:
+    """Account the calls of the decorated function to phase `name`."""
+
+    def decorator(func: typing.Callable[P, R]) -> typing.Callable[P, R]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if not _recorders:
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def _recording(
+    recorder: Timings | Trace | _Profiler,
+) -> typing.Generator[None, None, None]:
+    global _recorders, _tracers
+    previous = _recorders, _tracers
+    _recorders += (recorder,)
+    if isinstance(recorder, Trace):
+        _tracers += (recorder,)
+    try:
+        yield
+    finally:
+        _recorders, _tracers = previous
+
+
+@contextlib.contextmanager
+def timings(
+    show: bool = True, json_file: pathlib.Path | None = None
+) -> typing.Generator[Timings | None, None, None]:
+    """Collect timings while in this context, logging them and writing them as JSON.
+
+    Nothing is collected if neither `show` nor `json_file` are set.
+    """
+    if not show and json_file is None:
+        yield None
+        return
+    collected = Timings()
+    try:
+        with _recording(collected):
+            yield collected
+    finally:
+        if show:
+            for line in collected.table():
+                logging.info(line)
+        if json_file is not None:
+            with open(json_file, "w") as out:
+                json.dump(collected.asdict(), out, indent=2)
+
+
+@contextlib.contextmanager
+def tracing(file: pathlib.Path | None) -> typing.Generator[Trace | None, None, None]:
+    """Trace phases and spans while in this context, writing them to `file`.
+
+    Nothing is traced without a `file`.
+    """
+    if file is None:
+        yield None
+        return
+    trace = Trace()
+    try:
+        with _recording(trace):
+            yield trace
+    finally:
+        with open(file, "w") as out:
+            json.dump(trace.asdict(), out)
+
+
+_profilers = {"cprofile": _CProfiler, "sampling": _Sampler}
+
+
+@contextlib.contextmanager
+def profiled(
+    kind: str | None, file: pathlib.Path | None = None
+) -> typing.Generator[_Profiler | None, None, None]:
+    """Profile workflow code while in this context, with a profiler of `kind`.
+
+    `cprofile` writes `pstats` data, and `sampling` collapsed stacks as read by
+    flame graph tools, to `file`. Nothing is profiled without a `kind`.
+    """
+    if kind is None:
+        yield None
+        return
+    profiler = _profilers[kind]()
+    file = file or pathlib.Path(
+        "gh-gen.prof" if kind == "cprofile" else "gh-gen.collapsed"
+    )
+    try:
+        with _recording(profiler):
+            yield profiler
+    finally:
+        profiler.write(file)
+        attribution = profiler.attribution()
+        total = sum(attribution.values())
+        shares = ", ".join(
+            f"{kind} {seconds / total:.1%}"
+            for kind, seconds in sorted(attribution.items(), key=lambda a: -a[1])
+        )
+        logging.info(f"profile written to {file}" + (f": {shares}" if total else ""))
+
+
+@contextlib.contextmanager
+def memory_report(enabled: bool) -> typing.Generator[_MemoryReport | None, None, None]:
+    """Report the memory used by each workflow while in this context, if `enabled`."""
+    if not enabled:
+        yield None
+        return
+    report = _MemoryReport()
+    report.begin()
+    try:
+        with _recording(report):
+            yield report
+    finally:
+        for line in report.table():
+            logging.info(line)
+        report.end()
@@ -0,0 +1,283 @@
+"""Optional removal of dead steps and jobs, enabled with `@workflow(prune=True)`.
+
+`if` conditions are evaluated against what is known when generating: matrix
+values, the domains of boolean and choice inputs, and literals. A step or job
+whose condition is false for every matrix combination and every input value is
+dropped, while a condition that is always true is dropped itself.
+
+Steps and jobs that are always skipped still cost runner time and log noise,
+most visibly in matrix jobs.
+"""
+
+import itertools
+import logging
+import typing
+
+from .expr import Expr, CallExpr, LiteralExpr, _Unknown, _unknown, _truth, evaluate
+from .simplify import has_status_check
+from .workflow import Input, Job, Matrix, Step, Workflow
+
+# cap on the number of contexts a condition is evaluated in
+_max_contexts = 4096
+
+# all contexts, most of which are only known at run time
+_contexts = (
+    "github",
+    "env",
+    "vars",
+    "job",
+    "jobs",
+    "steps",
+    "runner",
+    "secrets",
+    "strategy",
+    "matrix",
+    "needs",
+    "inputs",
+)
+
+
+def _static(value: typing.Any) -> typing.Any:
+    """The value of `value` if known before run time, `_unknown` otherwise."""
+    match value:
+        case LiteralExpr(_value=v):
+            return v
+        case Expr():
+            return _unknown
+        case str() if "\0" in value or "${{" in value:
+            return _unknown
+        case None | bool() | int() | float() | str():
+            return value
+        case list():
+            return [_static(v) for v in value]
+        case dict():
+            return {k: _static(v) for k, v in value.items()}
+        case _:
+            return _unknown
+
+
+def _has_unknown(value: typing.Any) -> bool:
+    match value:
+        case _Unknown():
+            return True
+        case list():
+            return any(map(_has_unknown, value))
+        case dict():
+            return any(map(_has_unknown, value.values()))
+        case _:
+            return False
+
+
+def _matrix_combinations(job: Job) -> list[typing.Any]:
+    """The values `matrix` takes in the instances of `job`."""
+    if job.strategy is None or job.strategy.matrix is None:
+        return [{}]
+    matrix = job.strategy.matrix
+    if not isinstance(matrix, Matrix):
+        return [_unknown]
+    values = {k: _static(v) for k, v in (matrix.values or {}).items()}
+    values = {k: v if isinstance(v, list) else [_unknown] for k, v in values.items()}
+    excludes = [_static(x) for x in matrix.exclude or ()]
+    includes = [_static(x) for x in matrix.include or ()]
+    if (
+        not all(isinstance(x, dict) for x in excludes + includes)
+        or _has_unknown(excludes + includes)
+        or (includes and _has_unknown(values))
+    ):
+        return [_unknown]
+    ret = []
+    if values:
+        ret = [dict(zip(values, c)) for c in itertools.product(*values.values())]
+    # unknown values never match, so combinations are only excluded for sure
+    ret = [
+        c
+        for c in ret
+        if not any(all(c.get(k) == v for k, v in x.items()) for x in excludes)
+    ]
+    originals = len(ret)
+    for include in includes:
+        # an include extends the original combinations it does not overwrite,
+        # and is a combination on its own if there is none
+        extended = False
+        for c in ret[:originals]:
+            if all(c[k] == v for k, v in include.items() if k in values):
+                c.update(include)
+                extended = True
+        if not extended:
+            ret.append(dict(include))
+    return ret or [_unknown]
+
+
+def _input_domain(inputs: list[Input]) -> list[typing.Any] | None:
+    """Values an input may take, or `None` if they are not enumerable."""
+    ret = []
+    for i in inputs:
+        match i.type:
+            case "boolean":
+                domain = [True, False]
+            case "choice" if i.options:
+                domain = list(i.options)
+            case _:
+                return None
+        if not i.required and i.default is None:
+            domain.append(None)
+        ret += (v for v in domain if v not in ret)
+    return ret
+
+
+def _input_assignments(workflow: Workflow) -> list[typing.Any]:
+    """The values `inputs` may take, as far as they can be enumerated.
+
+    Defaults are not taken as the values of inputs, as callers can override them.
+    """
+    on = workflow.on
+    triggers = [t for t in (on.workflow_dispatch, on.workflow_call) if t is not None]
+    by_id: dict[str, list[Input]] = {}
+    for t in triggers:
+        for i in t.inputs or ():
+            by_id.setdefault(i.id, []).append(i)
+    # other events leave `inputs` empty
+    other_triggers = any(
+        getattr(on, f) is not None
+        for f in type(on).__dataclass_fields__
+        if f not in ("inputs", "workflow_dispatch", "workflow_call")
+    )
+    domains = {}
+    for id, inputs in by_id.items():
+        domain = _input_domain(inputs)
+        if domain is None:
+            domain = [_unknown]
+        elif other_triggers and None not in domain:
+            domain.append(None)
+        domains[id] = domain
+    count = 1
+    for domain in domains.values():
+        count *= len(domain)
+    if count > _max_contexts:
+        return [_unknown]
+    return [dict(zip(domains, c)) for c in itertools.product(*domains.values())]
+
+
+def _decide(condition: typing.Any, contexts: list[dict]) -> bool | None:
+    """Truthiness of `condition` in all `contexts`, if it is the same in all."""
+    if condition is None:
+        return None
+    if not isinstance(condition, Expr):
+        condition = _static(condition)
+        if isinstance(condition, str):
+            # raw expression text, not parsed here
+            return None
+        return _truth(condition)
+    ret = set()
+    for context in contexts:
+        try:
+            ret.add(_truth(evaluate(condition, context)))
+        except ValueError:
+            # fails at run time, which is none of our business here
+            return None
+        if None in ret or len(ret) > 1:
+            return None
+    return ret.pop() if ret else None
+
+
+def _contexts_for(inputs: list, matrices: list) -> list[dict]:
+    base = dict.fromkeys(_contexts, _unknown)
+    if len(inputs) * len(matrices) > _max_contexts:
+        inputs = [_unknown]
+    return [
+        base | {"inputs": i, "matrix": m}
+        for i, m in itertools.product(inputs, matrices)
+    ]
+
+
+def _collapse(element: Job | Step) -> None:
+    """Drop a condition that is always true."""
+    if isinstance(element.if_, Expr) and has_status_check(element.if_):
+        element.if_ = CallExpr("always")
+    else:
+        element.if_ = None
+
+
+def _describe(step: Step) -> str:
+    for label in (step.id, step.name, step.uses, step.run):
+        if isinstance(label, str) and label:
+            return repr(label.splitlines()[0])
+    return "step"
+
+
+def _prune_steps(workflow_id: str, job_id: str, job: Job, contexts: list[dict]):
+    referenced = {
+        path[1] for path in Expr._paths(job) if len(path) > 1 and path[0] == "steps"
+    }
+    dead = []
+    for step in job.steps:
+        match _decide(step.if_, contexts):
+            case False if step.id not in referenced:
+                dead.append(step)
+            case True:
+                _collapse(step)
+                logging.debug(
+                    f"{workflow_id}.{job_id}: {_describe(step)} always runs, dropped its condition"
+                )
+    if len(dead) == len(job.steps):
+        # a job needs steps, and is better left alone than turned invalid
+        return
+    for step in dead:
+        logging.debug(
+            f"{workflow_id}.{job_id}: dropped {_describe(step)}, its condition is always false"
+        )
+    job.steps = [s for s in job.steps if not any(s is d for d in dead)]
+
+
+def prune(workflow: Workflow, workflow_id: str) -> None:
+    """Drop steps and jobs of `workflow` that can never run, in place.
+
+    Jobs that depend on a dropped job are dropped as well, unless their
+    condition contains a status check function and they may run anyway, in
+    which case the dropped job is kept.
+    """
+    inputs = _input_assignments(workflow)
+    dead = set()
+    for id, job in workflow.jobs.items():
+        match _decide(job.if_, _contexts_for(inputs, [_unknown])):
+            case False:
+                dead.add(id)
+            case True:
+                _collapse(job)
+                logging.debug(f"{workflow_id}.{id}: always runs, dropped its condition")
+        if job.steps:
+            _prune_steps(
+                workflow_id, id, job, _contexts_for(inputs, _matrix_combinations(job))
+            )
+    needed_by = {id: [] for id in workflow.jobs}
+    for id, job in workflow.jobs.items():
+        for n in job.needs or ():
+            needed_by.setdefault(n, []).append(id)
+    # skipped jobs skip the jobs needing them, unless those check statuses
+    stack = list(dead)
+    while stack:
+        for id in needed_by.get(stack.pop(), ()):
+            job = workflow.jobs[id]
+            if id not in dead and not (
+                isinstance(job.if_, Expr) and has_status_check(job.if_)
+            ):
+                dead.add(id)
+                stack.append(id)
+    # jobs that are still needed, or that outputs refer to, must stay
+    referenced = {
+        path[1]
+        for path in Expr._paths(workflow.on)
+        if len(path) > 1 and path[0] == "jobs"
+    }
+    changed = True
+    while changed:
+        changed = False
+        for id in list(dead):
+            if id in referenced or any(n not in dead for n in needed_by.get(id, ())):
+                dead.remove(id)
+                changed = True
+    if dead == set(workflow.jobs):
+        return
+    for id in dead:
+        logging.debug(f"{workflow_id}: dropped job {id}, it never runs")
+    workflow.jobs = {id: job for id, job in workflow.jobs.items() if id not in dead}
@@ -1,3 +1,4 @@
+import dataclasses
 import typing
 
 from .types import RefTree
@@ -25,8 +26,32 @@ class _RulesDict(dict):
             self.rules.append((rule, value))
 
 
+@dataclasses.dataclass
+class _RuleTrie:
+    """Rule patterns by segment, with `*` segments on a separate wildcard edge.
+
+    Rules are stored at the node their pattern ends at, along with their
+    definition order.
+    """
+
+    children: dict[str, "_RuleTrie"] = dataclasses.field(default_factory=dict)
+    wildcard: typing.Optional["_RuleTrie"] = None
+    rules: list[tuple[int, typing.Callable]] = dataclasses.field(default_factory=list)
+
+    def add(self, pattern: tuple[str, ...], index: int, func: typing.Callable):
+        node = self
+        for segment in pattern:
+            if segment == "*":
+                node.wildcard = node.wildcard or _RuleTrie()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, _RuleTrie())
+        node.rules.append((index, func))
+
+
 class _RuleSetMetaclass(type):
-    _rules: dict[int, list[tuple[tuple[str, ...], typing.Callable]]]
+    _rules: list[tuple[tuple[str, ...], typing.Callable]]
+    _trie: _RuleTrie
 
     @classmethod
     def __prepare__(metacls, name, bases):
@@ -34,43 +59,55 @@ class _RuleSetMetaclass(type):
 
     def __new__(cls, name, bases, classdict):
         ret = super().__new__(cls, name, bases, dict(classdict))
-        ret._rules = {}
+        ret._rules = []
         for base in bases:
             if isinstance(base, cls):
-                ret._rules |= base._rules
-        for r, func in classdict.rules:
-            ret._rules.setdefault(len(r), []).append((r, func))
+                ret._rules += (r for r in base._rules if r not in ret._rules)
+        ret._rules += classdict.rules
+        ret._trie = _RuleTrie()
+        for i, (r, func) in enumerate(ret._rules):
+            ret._trie.add(r, i, func)
         return ret
 
 
+type _State = tuple[_RuleTrie, tuple[str, ...]]
+
+
 class RuleSet(metaclass=_RuleSetMetaclass):
     @staticmethod
-    def _match(lhs: tuple[str, ...], rhs: tuple[str, ...]) -> tuple[str, ...] | None:
-        ret = ()
-        for l, r in zip(lhs, rhs):
-            if r == "*":
-                ret += (l,)
-            elif l != r:
-                return None
+    def _advance(states: list[_State], segment: str) -> list[_State]:
+        ret = []
+        for node, captures in states:
+            child = node.children.get(segment)
+            if child is not None:
+                ret.append((child, captures))
+            if node.wildcard is not None:
+                ret.append((node.wildcard, captures + (segment,)))
         return ret
 
-    @staticmethod
-    def _traverse_reftree(
-        reftree: RefTree, prefix: tuple[str, ...] = ()
-    ) -> typing.Generator[tuple[str, ...], None, None]:
-        yield prefix
-        for k, rest in reftree.items():
-            if k != "*":
-                yield from RuleSet._traverse_reftree(rest, prefix + (k,))
-
     def validate(self, value: typing.Any, **kwargs: typing.Any) -> bool:
         tree = reftree(value)
         if not tree:
             return True
-        for path in self._traverse_reftree(tree):
-            for rule, func in self._rules.get(len(path), ()):
-                m = self._match(path, rule)
-                if m is not None:
-                    if not func(self, *m, **kwargs):
-                        return False
+        # walk the reftree depth first, along with the rule trie states matching
+        # each path, skipping subtrees no rule can match
+        stack: list[tuple[RefTree, list[_State]]] = [(tree, [(self._trie, ())])]
+        while stack:
+            tree, states = stack.pop()
+            matches = [
+                (i, func, captures)
+                for node, captures in states
+                for i, func in node.rules
+            ]
+            matches.sort(key=lambda m: m[0])
+            for _, func, captures in matches:
+                if not func(self, *captures, **kwargs):
+                    return False
+            children = []
+            for k, rest in tree.items():
+                if k != "*":
+                    next_states = self._advance(states, k)
+                    if next_states:
+                        children.append((rest, next_states))
+            stack.extend(reversed(children))
         return True
@@ -0,0 +1,247 @@
+"""Optional simplification pass over `Expr` trees, enabled with `@workflow(simplify=True)`.
+
+Conditions generated by helper libraries tend to accumulate redundant parts
+(`true && ...`, `a && a`, `!!x`, `always() || ...`). Rewrites here preserve the
+value of an expression; conditions (`if` fields) only need their truthiness
+preserved, which allows a few more of them.
+"""
+
+import dataclasses
+import typing
+
+from .element import Element
+from .expr import (
+    BinOpExpr,
+    CallExpr,
+    DotExpr,
+    Expr,
+    ItemExpr,
+    LiteralExpr,
+    NotExpr,
+    _RootRewrite,
+    _compare,
+    _truthy,
+)
+
+try:
+    from string.templatelib import Template, Interpolation
+except ImportError:  # Python < 3.14
+    Template = None
+    Interpolation = None
+
+_status_functions = frozenset(("always", "success", "failure", "cancelled"))
+_boolean_functions = _status_functions | {"contains", "startsWith", "endsWith"}
+_comparisons = frozenset(("==", "!=", "<", "<=", ">", ">="))
+_dual = {"&&": "||", "||": "&&"}
+
+_always = CallExpr("always")
+
+
+def _children(e: Expr) -> tuple[Expr, ...]:
+    match e:
+        case BinOpExpr(_left=l, _right=r):
+            return l, r
+        case NotExpr(_expr=x) | DotExpr(_expr=x) | _RootRewrite(_inner=x):
+            return (x,)
+        case ItemExpr(_expr=x, _index=i):
+            return x, i
+        case CallExpr(_args=args):
+            return args
+        case _:
+            return ()
+
+
+def has_status_check(e: Expr) -> bool:
+    """Whether `e` calls a status check function (`always()`, `success()`, ...).
+
+    A condition without any gets an implicit `success() &&` from the runner, so
+    rewrites must not add or drop the last status check of a condition.
+    """
+    stack = [e]
+    while stack:
+        e = stack.pop()
+        if isinstance(e, CallExpr) and e._function in _status_functions:
+            return True
+        stack.extend(_children(e))
+    return False
+
+
+def _is_boolean(e: Expr) -> bool:
+    match e:
+        case LiteralExpr(_value=bool()) | NotExpr():
+            return True
+        case BinOpExpr(_op=op) if op in _comparisons:
+            return True
+        case BinOpExpr(_left=l, _right=r):
+            return _is_boolean(l) and _is_boolean(r)
+        case CallExpr(_function=f):
+            return f in _boolean_functions
+        case _:
+            return False
+
+
+def _operands(e: Expr, op: str) -> typing.Generator[Expr, None, None]:
+    """Operands of a left-associated chain of `op`, in order, without recursing."""
+    rest = []
+    while isinstance(e, BinOpExpr) and e._op == op:
+        rest.append(e._right)
+        e = e._left
+    yield e
+    yield from reversed(rest)
+
+
+def _combine(op: str, lhs: Expr, rhs: Expr, condition: bool) -> Expr:
+    is_and = op == "&&"
+    # a constant left operand decides what the whole expression evaluates to
+    if isinstance(lhs, LiteralExpr):
+        return rhs if _truthy(lhs._value) == is_and else lhs
+    # `a && b && b` is `a && b`: the last operand decides the value when reached
+    if lhs._same(rhs) or (
+        isinstance(lhs, BinOpExpr) and lhs._op == op and lhs._right._same(rhs)
+    ):
+        return lhs
+    if lhs._same(_always):
+        if not is_and:
+            return lhs
+        if has_status_check(rhs):
+            return rhs
+    # absorption: `a && (a || b)` is `a`, and so is `a || (a && b)`
+    if isinstance(rhs, BinOpExpr) and rhs._op == _dual[op]:
+        absorbed = list(_operands(rhs, rhs._op))
+        if not condition:
+            absorbed = absorbed[:1]
+        if any(lhs._same(x) for x in absorbed):
+            return lhs
+    if isinstance(rhs, LiteralExpr):
+        # `x && true` and `x || false` are `x` if `x` is a boolean
+        if condition and _truthy(rhs._value) == is_and:
+            return lhs
+        if rhs._value is is_and and _is_boolean(lhs):
+            return lhs
+        if condition:
+            return rhs
+    if condition and not is_and and rhs._same(_always):
+        return rhs
+    return BinOpExpr(lhs, rhs, op)
+
+
+def _simplify_chain(e: BinOpExpr, condition: bool) -> Expr:
+    op = e._op
+    operands = []
+    for x in _operands(e, op):
+        # simplified operands may turn out to be chains of the same operator
+        operands.extend(_operands(_simplify(x, condition), op))
+    if condition:
+        # only truthiness matters, so repeated operands can go, and an operand
+        # together with its negation decides the whole chain
+        seen = {}
+        for x in operands:
+            seen.setdefault(id(x), x)
+        for x in seen.values():
+            if isinstance(x, NotExpr) and id(x._expr) in seen:
+                return LiteralExpr(op == "||")
+        operands = list(seen.values())
+    ret = operands[0]
+    for x in operands[1:]:
+        ret = _combine(op, ret, x, condition)
+        # render as we go, so that long chains do not render recursively later
+        ret._syntax
+    return ret
+
+
+def _simplify(e: Expr, condition: bool) -> Expr:
+    match e:
+        case NotExpr(_expr=x):
+            # `!` only looks at the truthiness of its operand
+            x = _simplify(x, True)
+            match x:
+                case LiteralExpr(_value=v):
+                    return LiteralExpr(not _truthy(v))
+                case NotExpr(_expr=y) if condition or _is_boolean(y):
+                    return y
+                case BinOpExpr(_left=l, _right=r, _op="==" | "!=" as op):
+                    return BinOpExpr(l, r, "!=" if op == "==" else "==")
+            return NotExpr(x)
+        case BinOpExpr(_op="&&" | "||"):
+            return _simplify_chain(e, condition)
+        case BinOpExpr(_left=l, _right=r, _op=op):
+            l = _simplify(l, False)
+            r = _simplify(r, False)
+            if isinstance(l, LiteralExpr) and isinstance(r, LiteralExpr):
+                return LiteralExpr(_compare(op, l._value, r._value))
+            return BinOpExpr(l, r, op)
+        case ItemExpr(_expr=x, _index=i):
+            return ItemExpr(_simplify(x, False), _simplify(i, False))
+        case DotExpr(_expr=x, _attr=attr):
+            return DotExpr(_simplify(x, False), attr)
+        case CallExpr(_function=f, _args=args):
+            return CallExpr(f, *(_simplify(a, False) for a in args))
+        case _RootRewrite(_inner=x, _from_root=from_root, _to_root=to_root):
+            return _RootRewrite(_simplify(x, condition), from_root, to_root)
+        case _:
+            return e
+
+
+def simplify(e: Expr, *, condition: bool = False) -> Expr:
+    """Return an expression equivalent to `e`, possibly shorter.
+
+    With `condition`, `e` is taken to be an `if` condition, for which only
+    truthiness matters.
+    """
+    e = e._access
+    ret = _simplify(e, condition)
+    if condition and not has_status_check(ret) and has_status_check(e):
+        # the status check was folded away: keep the runner from adding an
+        # implicit `success()`, unless the condition is false anyway
+        match ret:
+            case LiteralExpr(_value=v) if not _truthy(v):
+                pass
+            case LiteralExpr():
+                ret = _always
+            case _:
+                ret = BinOpExpr(_always, ret, "&&")
+    return ret
+
+
+def simplify_values[T](x: T, *, condition: bool = False) -> T:
+    """Simplify every `Expr` found in `x`, updating `Element`s in place.
+
+    `if` fields are simplified as conditions.
+    """
+    if Template is not None and isinstance(x, Template):
+        return Template(
+            *(
+                (
+                    item
+                    if isinstance(item, str)
+                    else Interpolation(
+                        simplify_values(item.value),
+                        item.expression,
+                        item.conversion,
+                        item.format_spec,
+                    )
+                )
+                for item in x
+            )
+        )
+    match x:
+        case Expr():
+            return simplify(x, condition=condition)
+        case Element():
+            for f in dataclasses.fields(x):
+                # skip views over other fields, like `On.inputs`
+                if f.init:
+                    value = getattr(x, f.name)
+                    if value is not None:
+                        setattr(
+                            x,
+                            f.name,
+                            simplify_values(value, condition=f.name == "if_"),
+                        )
+            return x
+        case dict():
+            return {k: simplify_values(v) for k, v in x.items()}
+        case list():
+            return [simplify_values(v) for v in x]
+        case _:
+            return x
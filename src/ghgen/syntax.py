@@ -1,11 +1,14 @@
 import collections.abc
 import contextlib
+import copy
 import dataclasses
+import functools
 import inspect
 import itertools
 import keyword
 import re
 import textwrap
+import threading
 import types
 import typing
 import ast
@@ -30,7 +33,12 @@ try:
 except ImportError:  # Python < 3.14
     Template = None
 from . import workflow
+from . import profiling as _profiling
 from .contexts import *
+from .element import _field_table
+from .contexts import _IdIndex
+from .simplify import simplify_values
+from .prune import prune as prune_workflow
 
 
 @dataclass
@@ -47,42 +55,49 @@ class Error:
 _this_dir = pathlib.Path(__file__).parent
 
 
-def _get_user_frame() -> typing.Any:
-    frame = inspect.currentframe()
+@functools.cache
+def _is_internal(filename: str) -> bool:
+    # this app, or contextlib (that wraps some of our functions)
+    return (
+        pathlib.Path(filename).is_relative_to(_this_dir)
+        or filename == contextlib.__file__
+    )
 
-    for frame in iter(lambda: frame.f_back, None):
-        filename = frame.f_code.co_filename
-        # get first frame out of this app or contextlib (that wraps some of our functions)
-        if not (
-            pathlib.Path(filename).is_relative_to(_this_dir)
-            or filename == contextlib.__file__
-        ):
-            break
+
+def _get_user_frame() -> types.FrameType:
+    frame = inspect.currentframe().f_back
+    while frame.f_back is not None and _is_internal(frame.f_code.co_filename):
+        frame = frame.f_back
     return frame
 
 
-def _get_user_frame_info() -> inspect.Traceback:
-    return inspect.getframeinfo(_get_user_frame())
+def _get_user_location() -> tuple[str, int]:
+    """File and line of the user code being run.
+
+    Unlike `inspect.getframeinfo`, this does not read any source.
+    """
+    frame = _get_user_frame()
+    return frame.f_code.co_filename, frame.f_lineno
 
 
 # A single `name = <builder chain>` assignment target, resolved from the AST of
-# the user's frame. Parent maps are cached per source tree.
-_parent_maps: dict[str, dict[ast.AST, ast.AST]] = {}
+# the user's frame. Parent maps are cached for the most recent source trees, and
+# resolved targets per call site, as loops hit the same call sites over and over.
+_max_call_sites = 4096
+_assigned_names: dict[tuple[types.CodeType, int], str | None] = {}
+_assigned_names_lock = threading.Lock()
 
 
+@functools.lru_cache(maxsize=32)
 def _parent_map(source: "executing.Source") -> dict[ast.AST, ast.AST] | None:
     tree = source.tree
     if tree is None:
         return None
-    cached = _parent_maps.get(source.filename)
-    if cached is None:
-        cached = {
-            child: parent
-            for parent in ast.walk(tree)
-            for child in ast.iter_child_nodes(parent)
-        }
-        _parent_maps[source.filename] = cached
-    return cached
+    return {
+        child: parent
+        for parent in ast.walk(tree)
+        for child in ast.iter_child_nodes(parent)
+    }
 
 
 def _assigned_name() -> str | None:
@@ -93,8 +108,23 @@ def _assigned_name() -> str | None:
     there. Returns `None` when there is no plain `name = ...` assignment to infer
     a name from (e.g. inline use, or a tuple/attribute target).
     """
+    frame = _get_user_frame()
+    key = (frame.f_code, frame.f_lasti)
+    try:
+        return _assigned_names[key]
+    except KeyError:
+        pass
+    ret = _resolve_assigned_name(frame)
+    with _assigned_names_lock:
+        if len(_assigned_names) >= _max_call_sites:
+            # drop the oldest call site
+            del _assigned_names[next(iter(_assigned_names))]
+        _assigned_names[key] = ret
+    return ret
+
+
+def _resolve_assigned_name(frame: types.FrameType) -> str | None:
     try:
-        frame = _get_user_frame()
         source = executing.Source.for_frame(frame)
         node = source.executing(frame).node
         parents = _parent_map(source)
@@ -146,38 +176,68 @@ def _representable(val: typing.Any) -> bool:
             return False
 
 
-def _typecheck(val: typing.Any, ty: typing.Type) -> bool:
+def _is_expr_value(val: typing.Any) -> bool:
+    return (
+        isinstance(val, Expr)
+        or (isinstance(val, str) and "${{" in val)
+        or (Template is not None and isinstance(val, Template))
+    )
+
+
+def _is_plain_str(val: typing.Any) -> bool:
+    return isinstance(val, str) and "${{" not in val
+
+
+@functools.cache
+def _type_checker(ty: typing.Any) -> typing.Callable[[typing.Any], bool]:
+    """Check for values of annotation `ty`, compiled once per annotation."""
     origin = typing.get_origin(ty)
     match origin:
         case None if ty is str:
-            return isinstance(val, ty) and "${{" not in val
+            return _is_plain_str
         case None if ty is Expr:
-            return (
-                isinstance(val, ty)
-                or (isinstance(val, str) and "${{" in val)
-                or (Template is not None and isinstance(val, Template))
-            )
+            return _is_expr_value
         case None:
-            return isinstance(val, ty)
+            return lambda val: isinstance(val, ty)
         case typing.Union | types.UnionType:
-            return any(_typecheck(val, x) for x in typing.get_args(ty))
+            args = typing.get_args(ty)
+            # plain classes are all checked with a single `isinstance`
+            classes = tuple(
+                x
+                for x in args
+                if typing.get_origin(x) is None and x is not str and x is not Expr
+            )
+            checkers = tuple(_type_checker(x) for x in args if x not in classes)
+            if not checkers:
+                return lambda val: isinstance(val, classes)
+            return lambda val: isinstance(val, classes) or any(c(val) for c in checkers)
         case typing.Literal:
-            return val in typing.get_args(ty)
+            values = typing.get_args(ty)
+            return lambda val: val in values
         case _ if origin is list:
             # element types are intentionally not enforced (they may hold `Expr`s
             # or numbers vetted later by reftree rules); only reject values that
             # cannot be serialized at all.
-            return isinstance(val, list) and all(_representable(v) for v in val)
+            return lambda val: isinstance(val, list) and all(map(_representable, val))
         case _ if origin is dict:
-            return isinstance(val, dict) and _representable(val)
+            return lambda val: isinstance(val, dict) and _representable(val)
         case _:
-            return isinstance(val, origin)
+            return lambda val: isinstance(val, origin)
+
+
+def _typecheck(val: typing.Any, ty: typing.Type) -> bool:
+    return _type_checker(ty)(val)
 
 
 @dataclass
 class _Context(ContextBase):
     auto_job_reason: str | None = None
     errors: list[Error] = field(default_factory=list)
+    # validations that passed, see `_validation_key`
+    validated: dict[tuple, tuple] = field(default_factory=dict)
+    # containers and elements created while building, by `id()`, which no one
+    # else holds and that can therefore be merged into in place
+    owned: dict[int, typing.Any] = field(default_factory=dict)
 
     def reset(self):
         self.reset_job()
@@ -185,10 +245,20 @@ class _Context(ContextBase):
         self.current_workflow_id = None
         self.auto_job_reason = None
         self.errors = []
+        self.id_indexes.clear()
+        self.owned.clear()
 
     def reset_job(self, job: Job | None = None, job_id: str | None = None):
         self.current_job = job
         self.current_job_id = job_id
+        self.validated.clear()
+
+    def own[T](self, x: T) -> T:
+        self.owned[id(x)] = x
+        return x
+
+    def owns(self, x: typing.Any) -> bool:
+        return self.owned.get(id(x)) is x
 
     def empty(self) -> bool:
         return (
@@ -200,10 +270,8 @@ class _Context(ContextBase):
         )
 
     def make_error(self, message: str, id: str | None = None) -> Error:
-        frame = _get_user_frame_info()
-        return Error(
-            frame.filename, frame.lineno, id or self.current_workflow_id, message
-        )
+        filename, lineno = _get_user_location()
+        return Error(filename, lineno, id or self.current_workflow_id, message)
 
     def error(self, message: str):
         error = self.make_error(message)
@@ -296,10 +364,39 @@ class _Context(ContextBase):
             )
         return job
 
+    def _validation_key(
+        self, value: typing.Any, target: typing.Any, field: str
+    ) -> tuple | None:
+        """Key under which a passed validation of `value` can be reused.
+
+        Rules look at the target type, the field and the current job. Besides
+        that they only check for things having been declared already (step
+        ids, outputs, matrix keys, jobs...), which stay declared, so passing
+        stays passing. Step rules also depend on where the target step is, and
+        `needs` rules have side effects, so they are never skipped.
+        """
+        if not isinstance(value, Expr):
+            return None
+        value = value._access
+        roots = {path[0] for path in value._get_paths()}
+        if "needs" in roots:
+            return None
+        return (
+            id(value),
+            type(target),
+            field,
+            id(self.current_workflow),
+            id(self.current_job),
+            id(target) if "steps" in roots else None,
+        )
+
+    @_profiling.timed("validate")
     def validate(self, value: typing.Any, *, target: typing.Any, field: str) -> bool:
+        key = self._validation_key(value, target, field)
+        if key is not None and key in self.validated:
+            return True
         if value is not None and isinstance(target, Element):
-            field_info = next(f for f in fields(target) if f.name == field)
-            assert field_info
+            field_info = _field_table(type(target))[field].field
             if not _typecheck(value, field_info.type):
                 log_type = re.sub(
                     r"(typing|src\.ghgen\.\w+)\.", "", str(field_info.type)
@@ -308,32 +405,54 @@ class _Context(ContextBase):
                     f"expected `{field}` to be of type `{log_type}`, got `{value!r}` of type `{type(value).__name__}`"
                 )
                 return False
-        return super().validate(value, target=target, field=field)
+        if not super().validate(value, target=target, field=field):
+            return False
+        if key is not None:
+            # keep what the key refers to by `id` alive
+            self.validated[key] = (value, target, self.current_workflow)
+        return True
 
 
 type _Path = tuple[str | int, ...]
 
 
+@functools.cache
+def _child_type(t: typing.Any, p: str | None) -> typing.Any:
+    """Type reached from `t` by field or key `p`, or by a list index if `None`."""
+    origin = typing.get_origin(t)
+    match p:
+        case str() if origin is None and issubclass(t, Element):
+            info = _field_table(t).get(p)
+            assert info is not None, f"no `{p}` field in `{t.__name__}`"
+            return info.type
+        case str() if origin is dict:
+            return typing.get_args(t)[1]
+        case None if origin is list:
+            return typing.get_args(t)[0]
+        case _:
+            assert False, f"unexpected access by `{p!r}` in `{t}`"
+
+
+@functools.lru_cache(maxsize=1024)
+def _path_types(start_type: type, path: tuple[str | None, ...]) -> tuple:
+    """Types along `path` from `start_type`, list indexes being given as `None`."""
+    ret = []
+    t = start_type
+    for p in path:
+        t = _child_type(t, p)
+        ret.append(t)
+    return tuple(ret)
+
+
+def _path_shape(path: tuple) -> tuple[str | None, ...]:
+    return tuple(p if isinstance(p, str) else None for p in path)
+
+
 def _type(path: _Path) -> type | None:
-    t = Workflow
     for p in path:
-        o = typing.get_origin(t)
-        match p:
-            case str() if issubclass(o or t, Element):
-                f = next((f for f in fields(o or t) if f.name == p), None)
-                assert f is not None, f"no `{p}` field in `{t.__name__}`"
-                t = f.type
-                if typing.get_origin(t) is types.UnionType:
-                    t = typing.get_args(t)[0]
-            case str() if o is dict:
-                t = typing.get_args(t)[1]
-            case int() if o is list and p >= 0:
-                t = typing.get_args(t)[0]
-            case _:
-                assert False, f"unexpected access by `{p!r}` in `{t}`"
-        if t is Value:
-            t = str
-    return t
+        assert not isinstance(p, int) or p >= 0, f"unexpected access by `{p!r}`"
+    t = _path_types(Workflow, _path_shape(path))[-1] if path else Workflow
+    return str if t is Value else t
 
 
 @dataclass
@@ -345,40 +464,36 @@ def _ensure_element_with_type(
     start: Workflow | Job, start_type: type, path: tuple[str | int, ...]
 ) -> tuple[typing.Any, type]:
     assert start is not None
+    if not path:
+        return start, start_type
     e = start
-    t = start_type
-    for p in path:
+    path_types = _path_types(start_type, _path_shape(path))
+    for p, t in zip(path, path_types):
         match e, p:
-            case _, str() if issubclass(t, Element):
-                f = next((f for f in fields(t) if f.name == p), None)
-                assert f is not None, f"no `{p}` field in `{t.__name__}`"
-                t = f.type
-                if typing.get_origin(t) in (types.UnionType, typing.Union):
-                    t = typing.get_args(t)[0]
+            case Element(), str():
                 next_e = getattr(e, p)
                 if next_e is None:
-                    setattr(e, p, t())
+                    setattr(e, p, _ctx.own(t()))
                     e = getattr(e, p)
                 else:
                     e = next_e
             case (list(), int() as i) | (list(), _Appender(index=int() as i)) if (
                 0 <= i <= len(e)
             ):
-                t = typing.get_args(t)[0]
                 if i == len(e):
-                    e.append(t())
+                    e.append(_ctx.own(t()))
                 e = e[i]
             case list(), _Appender(index=None):
-                t = typing.get_args(t)[0]
                 p.index = len(e)
-                e.append(t())
+                e.append(_ctx.own(t()))
                 e = e[-1]
             case dict(), str():
-                t = typing.get_args(t)[1]
-                e = e.setdefault(p, t())
+                if p not in e:
+                    e[p] = _ctx.own(t())
+                e = e[p]
             case _:
-                assert False, f"unexpected access by `{p!r}` in `{t}`"
-    return e, t
+                assert False, f"unexpected access by `{p!r}` in `{type(e)}`"
+    return e, path_types[-1]
 
 
 def _ensure_element(start: Workflow | Job, path: tuple[str | int, ...]) -> typing.Any:
@@ -442,9 +557,11 @@ class _Updater[T]:
     @property
     def _element(self) -> T:
         if self._cached_element is None:
-            parent = self._parent
+            if self._cached_parent is None:
+                return self._ensure()._cached_element
+            # bound to its parent already
             self._cached_element, _ = _ensure_element_with_type(
-                parent, self._cached_parent_type, (self._path[-1],)
+                self._cached_parent, self._cached_parent_type, self._path[-1:]
             )
         return self._cached_element
 
@@ -455,7 +572,7 @@ class _Updater[T]:
     @property
     def _parent(self) -> typing.Any:
         if self._cached_parent is None:
-            self._cached_parent, self._cached_parent_type = self._get_parent_with_type()
+            return self._get_parent_with_type()[0]
         return self._cached_parent
 
     def _update[U](
@@ -498,9 +615,20 @@ class _Updater[T]:
         return self
 
     def _ensure(self) -> typing.Self:
-        start = self._start(self._log_path)
-        _ensure_element(start, self._path)
-        return self
+        """An updater bound to the element at the path, creating it if needed.
+
+        Updaters like `container` are module globals, shared by all the jobs and
+        threads building workflows, so only the bound copy caches the element.
+        """
+        if self._cached_element is not None:
+            return self
+        parent, parent_type = self._get_parent_with_type()
+        ret = copy.copy(self)
+        ret._cached_parent, ret._cached_parent_type = parent, parent_type
+        ret._cached_element, _ = _ensure_element_with_type(
+            parent, parent_type, self._path[-1:]
+        )
+        return ret
 
     def _sub_updater[U](self, ty: type[U], *fields: str) -> U:
         return ty(self._start, self._path + fields)
@@ -542,14 +670,17 @@ class _IdElementUpdater[T](_Updater[T]):
         if not _ctx.validate(id, target=el, field="id"):
             return ret
         elif id is None:
+            old = el.id
             ret._update("id", _value, None)
+            _ctx.id_index(ret._parent).id_changed(el, old)
         elif el.id is not None:
             _ctx.error(f"id was already specified for this element as `{el.id}`")
-        elif any(s.id == id for s in ret._parent):
+        elif _ctx.id_index(ret._parent).position(id) is not None:
             parent_path = ".".join(map(str, ret._path[:-1]))
             _ctx.error(f"id `{id}` already used in `{parent_path}`")
         else:
             ret._update("id", _value, id)
+            _ctx.id_index(ret._parent).id_changed(el, None)
         return ret
 
     def ensure_id(self) -> str:
@@ -557,12 +688,15 @@ class _IdElementUpdater[T](_Updater[T]):
         el = ret._element
         if el.id is None:
             id = getattr(el, "_suggested_id", None)
-            parent = ret._parent
-            el.id = _allocate_id(
-                # remove `s` from name of parent list to get default name
-                id or ret._path[-2][:-1],
-                lambda id: all(i.id != id for i in parent),
-                start_from_one=id is None,
+            index = _ctx.id_index(ret._parent)
+            index.set_id(
+                el,
+                _allocate_id(
+                    # remove `s` from name of parent list to get default name
+                    id or ret._path[-2][:-1],
+                    index,
+                    start_from_one=id is None,
+                ),
             )
         return el.id
 
@@ -1159,27 +1293,48 @@ def _merge[T](field: str, lhs: T | None, rhs: T | None, recursed=False) -> T | N
             return None
         case _, None:
             return lhs
+        case dict(), dict() if _ctx.owns(lhs):
+            for k, v in rhs.items():
+                lhs[k] = _merge(k, lhs.get(k), v, recursed=True)
+            return lhs
         case dict(), dict():
-            return {
-                k: _merge(k, lhs.get(k), rhs.get(k), recursed=True) for k in lhs | rhs
-            }
-        case list(), list():
-            return lhs + rhs
+            return _ctx.own(
+                {k: _merge(k, lhs.get(k), rhs.get(k), recursed=True) for k in lhs | rhs}
+            )
         case list(), str() | bytes():
             assert False
-        case list(), typing.Iterable():
-            return lhs + list(rhs)
+        case list(), collections.abc.Iterable() if _ctx.owns(lhs):
+            lhs.extend(rhs)
+            return lhs
+        case list(), list():
+            return _ctx.own(lhs + rhs)
+        case list(), collections.abc.Iterable():
+            return _ctx.own(lhs + list(rhs))
+        case Element(), Element() if _ctx.owns(lhs):
+            for name, info in _field_table(type(lhs)).items():
+                if info.field.init:
+                    setattr(
+                        lhs,
+                        name,
+                        _merge(
+                            name, getattr(lhs, name), getattr(rhs, name), recursed=True
+                        ),
+                    )
+            # as when constructing a new element
+            if hasattr(lhs, "__post_init__"):
+                lhs.__post_init__()
+            return lhs
         case Element(), Element():
             data = {
-                f.name: _merge(
-                    f.name,
-                    getattr(lhs, f.name),
-                    getattr(rhs, f.name),
+                name: _merge(
+                    name,
+                    getattr(lhs, name),
+                    getattr(rhs, name),
                     recursed=True,
                 )
-                for f in fields(lhs)
+                for name in _field_table(type(lhs))
             }
-            return type(lhs)(**data)
+            return _ctx.own(type(lhs)(**data))
         case _:
             return rhs
 
@@ -1198,28 +1353,55 @@ class WorkflowInfo:
     spec: typing.Callable[..., None]
     errors: list[Error]
     file: pathlib.Path
+    simplify: bool = False
+    prune: bool = False
 
     _workflow: Workflow | None = None
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
 
     @property
     def worfklow(self) -> Workflow:
-        if self._workflow is None:
-            with _ctx.build_workflow(self.id) as self._workflow:
-                for e in self.errors:
-                    e.workflow_id = e.workflow_id or current_workflow_id()
-                _ctx.errors += self.errors
-                self.spec()
+        # built once, even if asked for from several threads
+        with self._lock:
+            if self._workflow is None:
+                with _profiling.phase("build", self.file, id=self.id):
+                    self._workflow = self._build()
         return self._workflow
 
+    def _build(self) -> Workflow:
+        with _ctx.build_workflow(self.id) as w:
+            for e in self.errors:
+                e.workflow_id = e.workflow_id or current_workflow_id()
+            _ctx.errors += self.errors
+            self.spec()
+        if self.simplify:
+            simplify_values(w)
+        if self.prune:
+            prune_workflow(w, self.id)
+        return w
+
 
 def workflow(
-    func: typing.Callable[..., None] | None = None, *, id=None
+    func: typing.Callable[..., None] | None = None,
+    *,
+    id=None,
+    simplify=False,
+    prune=False,
 ) -> typing.Callable[[typing.Callable[..., None]], WorkflowInfo] | WorkflowInfo:
     if func is None:
-        return lambda func: workflow(func, id=id)
+        return lambda func: workflow(func, id=id, simplify=simplify, prune=prune)
     id = id or func.__name__
     errors = []
-    return WorkflowInfo(id, func, errors, file=pathlib.Path(inspect.getfile(func)))
+    return WorkflowInfo(
+        id,
+        func,
+        errors,
+        file=pathlib.Path(inspect.getfile(func)),
+        simplify=simplify,
+        prune=prune,
+    )
 
 
 type JobCall = typing.Callable[..., None]
@@ -1232,7 +1414,7 @@ class _Job(ProxyExpr):
         if func is None:
             return lambda func: self(func, id=id)
         id = id or func.__name__
-        with _ctx.build_job(id):
+        with _profiling.span("job", id=id), _ctx.build_job(id):
             func()
             return getattr(Contexts.needs, id)
 
@@ -1262,25 +1444,16 @@ def needs(*args: RefExpr) -> list[str]:
     return prereqs
 
 
-def _allocate_id(
-    prefix: str, is_free: typing.Callable[[str], bool], *, start_from_one: bool = False
-) -> str:
+def _allocate_id(prefix: str, index: _IdIndex, *, start_from_one: bool = False) -> str:
     prefix = Element._key(prefix)  # replace underscores with dashes
-    if not start_from_one and is_free(prefix):
-        return prefix
-    return next(
-        (id for id in (f"{prefix}-{i}" for i in itertools.count(1)) if is_free(id))
-    )
+    return index.allocate(prefix, start_from_one=start_from_one)
 
 
 def _ensure_id(s: Step) -> str:
     if s.id is None:
         id = getattr(s, "_suggested_id", None)
-        s.id = _allocate_id(
-            id or "step",
-            lambda id: all(s.id != id for s in _ctx.current_job.steps),
-            start_from_one=id is None,
-        )
+        index = _ctx.id_index(_ctx.current_job.steps)
+        index.set_id(s, _allocate_id(id or "step", index, start_from_one=id is None))
     return s.id
 
 
@@ -336,11 +336,6 @@ class On(Element):
             if field.name != "inputs"
         )
 
-    def asdict(self) -> typing.Any:
-        ret = super().asdict()
-        ret.pop("inputs", None)
-        return ret
-
 
 def _flow_text(d: dict, *keys: str) -> dict:
     for k in keys:
@@ -1,4 +1,5 @@
 import inspect
+import unittest.mock
 
 import pytest
 
@@ -174,6 +175,46 @@ def test_undeclared_step_output(error):
     step("step2").run(x.outputs.bar)
 
 
+@expect_errors
+def test_declared_after_use(error):
+    on.workflow_dispatch()
+
+    @job
+    def j1():
+        x = step("x")
+        error("`foo` was not declared in step `x`, use `outputs()` to declare it")
+        step("y").run(x.outputs.foo)
+        x.outputs("foo")
+
+    @job
+    def j2():
+        error("`matrix` can only be used in a matrix job")
+        step(matrix.a)
+        strategy.matrix(a=[0])
+
+    @job
+    def j3():
+        strategy.matrix(a=[0])
+        error("`b` was not declared in the `matrix` for this job")
+        step(matrix.b)
+        strategy.matrix(b=[1])
+
+    @job
+    def j4():
+        error("`job.container` can only be used in a containerized job")
+        step(job.container.id)
+        container("node:18")
+
+    @job
+    def j5():
+        error("`job.services` can only be used in a job with services")
+        step(job.services.a.id)
+        service("a")
+        error("no `b` service defined in `job.services`")
+        step(job.services.b.id)
+        service("b")
+
+
 @expect_errors
 def test_wrong_job_needs(error):
     on.workflow_dispatch()
@@ -590,3 +631,49 @@ def test_runs_on_runner_with_labels_conflict(error):
     def j():
         error("job `j` cannot set `runs-on` with both a runner and `group`/`labels`")
         runs_on("ubuntu-latest", labels=["self-hosted"])
+
+
+@expect_errors
+def test_cached_validation_is_per_job(error):
+    on.workflow_dispatch()
+    linux = matrix.os == "linux"
+
+    @job
+    def a():
+        strategy.matrix(os=["linux", "windows"])
+        run("x").if_(linux)
+        run("y").if_(linux)
+
+    @job
+    def b():
+        error("`matrix` can only be used in a matrix job")
+        run("z").if_(linux)
+
+
+def test_error_locations_do_not_read_sources():
+    def wf():
+        on.workflow_dispatch()
+        env(FOO=steps)
+        run("")
+
+    with (
+        unittest.mock.patch("inspect.getframeinfo") as getframeinfo,
+        pytest.raises(GenerationError) as e,
+    ):
+        workflow(wf).worfklow
+    getframeinfo.assert_not_called()
+    [err] = e.value.errors
+    assert (err.filename, err.lineno) == (__file__, wf.__code__.co_firstlineno + 2)
+
+
+@expect_errors
+def test_duplicate_step_id(error):
+    on.workflow_dispatch()
+    run("x").id("x")
+    run("y").id("y")
+    error("id `x` already used in `steps`")
+    run("z").id("x")
+    error("step `w` not defined yet in job `test_duplicate_step_id`")
+    run(steps.w.outcome)
+    run("w").id("w")
+    run(steps.w.outcome)
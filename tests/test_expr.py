@@ -1,4 +1,6 @@
+import gc
 import warnings
+import weakref
 
 import pytest
 
@@ -320,3 +322,258 @@ def test_default_error():
     with pytest.raises(ValueError) as e:
         _ = ~ErrorExpr("an error")
     assert e.value.args == ("an error",)
+
+
+# --- deep expressions -----------------------------------------------------------
+#
+# Immutable nodes memoize their rendering and paths, so building a long chain and
+# rendering/validating it after every step stays linear. These count the actual
+# renders rather than timing them, to keep the check deterministic.
+
+
+def _and_chain(n: int) -> list[Expr]:
+    refs = [RefExpr(f"x{i}") for i in range(n)]
+    chain = [refs[0]]
+    for r in refs[1:]:
+        chain.append(chain[-1] & r)
+    return chain
+
+
+def test_deep_expression_renders_each_node_once():
+    n = 500
+    with unittest.mock.patch.object(
+        BinOpExpr, "_render", autospec=True, side_effect=BinOpExpr._render
+    ) as render:
+        chain = _and_chain(n)
+        for e in chain:
+            instantiate(e)
+            instantiate(e)
+        assert render.call_count == n - 1
+    assert (
+        instantiate(chain[-1])
+        == "${{ " + " && ".join(f"x{i}" for i in range(n)) + " }}"
+    )
+
+
+def test_deep_expression_collects_paths_once():
+    n = 500
+    with unittest.mock.patch.object(
+        BinOpExpr,
+        "_collect_paths",
+        autospec=True,
+        side_effect=BinOpExpr._collect_paths,
+    ) as collect:
+        chain = _and_chain(n)
+        for e in chain:
+            reftree(e)
+            reftree(e)
+        assert collect.call_count == n - 1
+    assert reftree(chain[-1]) == {f"x{i}": {} for i in range(n)}
+
+
+def test_deep_expression_formula():
+    chain = _and_chain(100)
+    for i, e in enumerate(chain):
+        formula = e._formula
+        assert formula == " && ".join(f"x{j}" for j in range(i + 1))
+        if i:
+            # `&` nodes memoize their rendering, references render on the fly
+            assert e._formula is formula
+            assert e._syntax is e._syntax
+
+
+# --- hash-consing ----------------------------------------------------------------
+
+
+def test_structurally_identical_nodes_are_shared():
+    a = RefExpr("a")
+    b = RefExpr("b")
+    f = function("foo", 2)
+
+    assert (a & b) is (a & b)
+    assert (~a | b["x"][0]) is (~a | b["x"][0])
+    assert f(a, "s") is f(a, "s")
+    assert LiteralExpr("x") is LiteralExpr("x")
+    assert (a & b) is not (b & a)
+    assert (a & b) is not (a | b)
+
+
+def test_literals_are_interned_by_type():
+    assert LiteralExpr(1) is not LiteralExpr(True)
+    assert LiteralExpr(1) is not LiteralExpr(1.0)
+    assert LiteralExpr(0.0) is not LiteralExpr(-0.0)
+    assert instantiate(LiteralExpr(-0.0)) == "${{ -0.0 }}"
+
+
+def test_mutable_literals_are_not_interned():
+    value = [1, 2]
+    e = LiteralExpr(value)
+    other = LiteralExpr([1, 2])
+    assert e is not other
+    assert instantiate(other) == "${{ [1, 2] }}"
+    value.append(3)
+    assert e._value == [1, 2, 3]
+    assert other._value == [1, 2]
+
+
+def test_structural_equality():
+    a = RefExpr("a")
+    b = RefExpr("b")
+
+    assert (a & (b == 1))._same(a & (b == 1))
+    assert not (a & (b == 1))._same(a & (b == 2))
+    assert (a & b)._hash() == (a & b)._hash()
+    assert LiteralExpr(42)._same(42)
+    assert not LiteralExpr(42)._same("42")
+    # `==` still builds an expression
+    assert instantiate((a & b) == (a & b)) == "${{ (a && b) == (a && b) }}"
+
+
+def test_shared_nodes_share_caches():
+    a = RefExpr("a")
+    b = RefExpr("b")
+    with unittest.mock.patch.object(
+        BinOpExpr, "_render", autospec=True, side_effect=BinOpExpr._render
+    ) as render:
+        for _ in range(10):
+            assert instantiate(a & b) == "${{ a && b }}"
+        assert render.call_count == 1
+
+
+def test_interned_nodes_are_not_kept_alive():
+    a = RefExpr("a")
+    e = a & LiteralExpr("some unique literal")
+    ref = weakref.ref(e)
+    del e
+    gc.collect()
+    assert ref() is None
+
+
+_context = {
+    "github": {"ref": "refs/heads/main", "event_name": "push"},
+    "matrix": {"os": "ubuntu", "python": 3.13, "include": [{"x": 1}, {"x": 2}]},
+    "steps": {
+        "build": {"outputs": {"version": "1.2"}},
+        "test": {"outputs": {"version": "1.3"}},
+    },
+    "job": {"status": "failure"},
+}
+
+
+@pytest.mark.parametrize(
+    "build,expected",
+    [
+        (lambda: RefExpr("github", "ref"), "refs/heads/main"),
+        (lambda: RefExpr("GitHub", "REF"), "refs/heads/main"),
+        (lambda: RefExpr("github", "missing", "x"), None),
+        (lambda: RefExpr("matrix")["os"] == "Ubuntu", True),
+        (lambda: RefExpr("matrix", "python") == "3.13", True),
+        (lambda: RefExpr("matrix", "python") > 3.1, True),
+        (lambda: RefExpr("matrix", "include")[1]["x"], 2),
+        (lambda: RefExpr("matrix", "include")[2], None),
+        (lambda: RefExpr("steps", "*", "outputs", "version"), ["1.2", "1.3"]),
+        (lambda: RefExpr("matrix", "os") & "yes", "yes"),
+        (lambda: RefExpr("matrix", "missing") | 0, 0),
+        (lambda: ~RefExpr("matrix", "missing"), True),
+        (lambda: function("contains", 2)(RefExpr("github", "ref"), "MAIN"), True),
+        (
+            lambda: function("contains", 2)(
+                RefExpr("steps", "*", "outputs", "version"), 1.3
+            ),
+            True,
+        ),
+        (lambda: function("startsWith", 2)(RefExpr("github", "ref"), "refs/"), True),
+        (lambda: function("endsWith", 2)(RefExpr("github", "ref"), "dev"), False),
+        (
+            lambda: function("format", 1, ...)(
+                "{{{0}}} {1}", RefExpr("matrix", "os"), 1
+            ),
+            "{ubuntu} 1",
+        ),
+        (lambda: function("join", 2)(["a", "b"], "+"), "a+b"),
+        (lambda: function("toJson")(RefExpr("matrix", "include")[0]), '{\n  "x": 1\n}'),
+        (lambda: function("fromJson")('{"a": [true]}')["a"][0], True),
+        (lambda: function("failure", 0)(), True),
+        (lambda: function("success", 0)(), False),
+        (lambda: function("always", 0)(), True),
+    ],
+)
+def test_evaluate(build, expected):
+    assert evaluate(build(), _context) == expected
+
+
+def test_evaluate_errors():
+    with pytest.raises(ValueError, match="unknown function `nope`"):
+        evaluate(function("nope")(1))
+    with pytest.raises(ValueError, match="wrong number of arguments"):
+        evaluate(CallExpr("contains", LiteralExpr(1)))
+    with pytest.raises(ValueError, match="invalid format string"):
+        evaluate(function("format", 1, ...)("{1}", 0))
+    with pytest.raises(ValueError, match="needs a workspace"):
+        evaluate(function("hashFiles", 1, ...)("*.txt"))
+
+
+def test_evaluate_hash_files(tmp_path):
+    import hashlib
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "sub" / "b.txt").write_text("b")
+    (tmp_path / "sub" / "c.lock").write_text("c")
+    hash_files = function("hashFiles", 1, ...)
+
+    def expected(*contents: bytes) -> str:
+        h = hashlib.sha256()
+        for c in contents:
+            h.update(hashlib.sha256(c).digest())
+        return h.hexdigest()
+
+    assert evaluate(hash_files("**/*.txt"), workspace=tmp_path) == expected(b"a", b"b")
+    assert evaluate(
+        hash_files("**/*", "!**/*.lock"), {"github": {"workspace": str(tmp_path)}}
+    ) == expected(b"a", b"b")
+    assert evaluate(hash_files("*.none"), workspace=tmp_path) == ""
+
+
+def test_rendered_syntax_tracks_refs():
+    a = RefExpr("a", "b")
+    c = RefExpr("c")
+    e = (a == "x") & c[a]
+    assert e._syntax == "a.b == 'x' && c[a.b]"
+    assert e._syntax.spans == ((0, ("a", "b")), (14, ("c",)), (16, ("a", "b")))
+    # markers only appear where refs must be tracked through f-strings
+    assert str(e) == "${{ \0a.b == 'x' && \0c[\0a.b] }}"
+    assert instantiate(e) == "${{ a.b == 'x' && c[a.b] }}"
+
+
+def test_rewrite_ref_root_uses_spans():
+    needs = RefExpr("needs", "x", "outputs", "y")
+    other = RefExpr("needsmore")
+    e = rewrite_ref_root(needs & other & needs, "needs", "jobs")
+    assert e._formula == "jobs.x.outputs.y && needsmore && jobs.x.outputs.y"
+    assert e._syntax.spans == (
+        (0, ("jobs", "x", "outputs", "y")),
+        (20, ("needsmore",)),
+        (33, ("jobs", "x", "outputs", "y")),
+    )
+    assert list(e._get_paths()) == [
+        ("jobs", "x", "outputs", "y"),
+        ("needsmore",),
+        ("jobs", "x", "outputs", "y"),
+    ]
+
+
+def test_rewrite_ref_root_in_strings():
+    needs = RefExpr("needs", "x", "outputs", "y")
+    other = RefExpr("needsmore")
+    value = f"{needs & other} {RefExpr('needs')}"
+    assert rewrite_ref_root(value, "needs", "jobs") == (
+        "${{ \0jobs.x.outputs.y && \0needsmore }} ${{ \0jobs }}"
+    )
+
+
+def test_plain_strings_are_not_scanned():
+    with unittest.mock.patch.object(_expr.re, "finditer") as finditer:
+        assert list(Expr._paths(["plain", {"k": "text"}])) == []
+        assert instantiate("plain") == "plain"
+    finditer.assert_not_called()
@@ -7,6 +7,8 @@ from unittest import mock
 import pytest
 
 from src.ghgen import main
+from src.ghgen.commands import generate
+from src.ghgen.commands.loader import ModuleLoader
 from conftest import Call
 
 
@@ -258,8 +260,14 @@ def test_update_regenerates_workflows(repo, mock_gh_api_call):
 class MockedGhApi:
     def __init__(self, monkeypatch):
         self.calls = {}
+        popen = subprocess.Popen
 
-        def mock_subprocess_popen(cmd, *, text, stdout, stderr=None):
+        def mock_subprocess_popen(cmd, **kwargs):
+            if cmd[0] != "gh":
+                return popen(cmd, **kwargs)
+            return mock_gh_popen(cmd, **kwargs)
+
+        def mock_gh_popen(cmd, *, text, stdout, stderr=None):
             assert text is True
             assert stdout is subprocess.PIPE
             ret = mock.MagicMock()
@@ -909,3 +917,91 @@ def test_trusted_owners(repo, mock_gh_api_call):
         -  trusted: false
         +  trusted: true
         """)
+
+
+def test_repos(repo, mock_gh_api_call):
+    for name in ("a", "b"):
+        subprocess.run(["git", "init", name], check=True)
+        repo.file(
+            f"{name}/gh-gen.yml",
+            """\
+            uses:
+                repo: owner/repo@v2
+            """,
+        )
+        repo.file(
+            f"{name}/.github/workflows/helper.py",
+            f"NAME = {name!r}\n",
+        )
+        repo.file(
+            f"{name}/.github/workflows/wf.py",
+            """\
+            from src.ghgen.syntax import *
+            from helper import NAME
+
+
+            @workflow
+            def wf():
+                on.push()
+                run(f"echo {NAME}")
+            """,
+        )
+    repo.file("repos.txt", "# all of them\na\n\nb\n")
+    # fetched once for both repositories
+    mock_gh_api_call(
+        "owner/repo",
+        "v2",
+        "sha_v2",
+        """\
+        name: My Action
+        inputs:
+            an-input:
+                required: false
+        """,
+    )
+    assert main(["--repos", "repos.txt"]) == 0
+    for name in ("a", "b"):
+        assert "sha: sha_v2" in pathlib.Path(name, "gh-gen.lock").read_text()
+        wf = pathlib.Path(name, ".github", "workflows", "wf.yml").read_text()
+        assert f"- run: echo {name}\n" in wf
+    assert main(["--repos", "repos.txt", "--check"]) == 0
+
+
+def test_repos_load_modules_separately(repo):
+    for name in ("a", "b"):
+        subprocess.run(["git", "init", name], check=True)
+        repo.file(f"{name}/.github/workflows/helper.py", f"NAME = {name!r}\n")
+        repo.file(
+            f"{name}/.github/workflows/wf.py",
+            """\
+            from src.ghgen.syntax import *
+            from helper import NAME
+
+
+            @workflow
+            def wf():
+                on.push()
+                run(f"echo {NAME}")
+            """,
+        )
+    repo.file("repos.txt", "a\nb\n")
+    top = pathlib.Path.cwd().resolve()
+    tracked = dict(generate._loader._tracked)
+    with mock.patch.object(
+        ModuleLoader, "load", autospec=True, side_effect=ModuleLoader.load
+    ) as load:
+        assert main(["--repos", "repos.txt"]) == 0
+    loaders = {}
+    for (loader, path), _ in load.call_args_list:
+        loaders.setdefault(path.resolve().relative_to(top).parts[0], set()).add(
+            id(loader)
+        )
+    # one loader per repository, which is not the one of the process
+    assert set(loaders) == {"a", "b"}
+    assert all(len(ids) == 1 for ids in loaders.values())
+    assert loaders["a"] != loaders["b"]
+    assert id(generate._loader) not in loaders["a"] | loaders["b"]
+    assert generate._loader._tracked == tracked
+    for name in ("a", "b"):
+        wf = pathlib.Path(name, ".github", "workflows", "wf.yml").read_text()
+        assert f"- run: echo {name}\n" in wf
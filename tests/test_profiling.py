@@ -0,0 +1,171 @@
+import json
+import logging
+import pstats
+
+import pytest
+
+from src.ghgen import main, profiling
+
+
+def test_phases_nest():
+    with profiling.timings(show=False, json_file=None) as timings:
+        assert timings is None
+        assert profiling._recorders == ()
+
+    with profiling.timings() as timings:
+        with profiling.phase("outer", "file.py"):
+            with profiling.phase("inner"):
+                pass
+            with profiling.phase("inner", "other.py"):
+                pass
+        with profiling.phase("inner"):
+            pass
+    assert profiling._recorders == ()
+    data = timings.asdict()
+    assert {k: v["calls"] for k, v in data["phases"].items()} == {
+        "outer": 1,
+        "inner": 3,
+    }
+    assert {k: sorted(v) for k, v in data["sources"].items()} == {
+        "file.py": ["inner", "outer"],
+        "other.py": ["inner"],
+    }
+    assert sum(p["seconds"] for p in data["phases"].values()) <= data["total"]
+
+
+def test_timed():
+    @profiling.timed("work")
+    def work(x):
+        return x + 1
+
+    assert work(1) == 2
+    with profiling.timings() as timings:
+        assert work(2) == 3
+    assert timings.phases["work"][1] == 1
+
+
+def test_timings_json(repo, caplog):
+    repo.file(
+        ".github/workflows/wf.py",
+        """\
+        from src.ghgen.syntax import *
+
+
+        @workflow
+        def wf():
+            on.push()
+            run("echo hello")
+        """,
+    )
+    caplog.set_level(logging.INFO)
+    assert main(["--timings", "--timings-json", "timings.json"]) == 0
+    data = json.loads(repo.path.joinpath("timings.json").read_text())
+    assert {
+        "lock sync",
+        "discovery",
+        "exec",
+        "build",
+        "validate",
+        "asdict",
+        "yaml",
+        "write",
+    } <= set(data["phases"])
+    wf = str(repo.path / ".github" / "workflows" / "wf.py")
+    assert {"exec", "build", "validate", "asdict", "yaml"} <= set(data["sources"][wf])
+    assert any(m.startswith("phase ") for m in caplog.messages)
+    assert any(m.startswith(".github/workflows/wf.py: ") for m in caplog.messages)
+
+
+def test_trace(repo):
+    repo.file(
+        ".github/workflows/wf.py",
+        """\
+        from src.ghgen.syntax import *
+
+
+        @workflow
+        def wf():
+            on.push()
+
+            @job
+            def first():
+                run("echo hello")
+
+            @job
+            def second():
+                run("echo world")
+        """,
+    )
+    assert main(["--trace", "trace.json"]) == 0
+    events = json.loads(repo.path.joinpath("trace.json").read_text())["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    assert {"generate", "lock sync", "exec", "build", "job", "validate"} <= {
+        e["name"] for e in spans
+    }
+    assert [e["args"]["id"] for e in spans if e["name"] == "job"] == [
+        "first",
+        "second",
+    ]
+    build = next(e for e in spans if e["name"] == "build")
+    assert build["args"] == {"source": ".github/workflows/wf.py", "id": "wf"}
+    assert [e["args"]["name"] for e in events if e["ph"] == "M"] == ["MainThread"]
+
+
+@pytest.mark.parametrize("kind", ["cprofile", "sampling"])
+def test_profile(repo, caplog, kind):
+    repo.file(
+        ".github/workflows/wf.py",
+        """\
+        import time
+
+        from src.ghgen.syntax import *
+
+
+        def busy():
+            end = time.perf_counter() + 0.05
+            while time.perf_counter() < end:
+                pass
+
+
+        busy()
+
+
+        @workflow
+        def wf():
+            on.push()
+            busy()
+            run("echo hello")
+        """,
+    )
+    caplog.set_level(logging.INFO)
+    assert main(["--profile", kind, "--profile-output", "out"]) == 0
+    (message,) = [m for m in caplog.messages if m.startswith("profile written")]
+    assert message.startswith("profile written to out: workflow code ")
+    if kind == "cprofile":
+        stats = pstats.Stats("out").stats
+        assert any(name == "busy" for _, _, name in stats)
+    else:
+        stacks = repo.path.joinpath("out").read_text().splitlines()
+        assert any("busy (.github/workflows/wf.py)" in s for s in stacks)
+
+
+def test_memory_report(caplog):
+    from src.ghgen import render
+    from src.ghgen.syntax import workflow, on, run
+
+    @workflow
+    def wf():
+        on.push()
+        for i in range(20):
+            run("echo " + str(i))
+
+    caplog.set_level(logging.INFO)
+    with profiling.memory_report(True) as report:
+        render(wf)
+    phases = {m.phase: m for m in report.phases_memory}
+    assert list(phases) == ["build", "asdict", "yaml"]
+    assert all(m.workflow == "wf" for m in phases.values())
+    assert phases["build"].types["Step"][0] == 20
+    assert "CommentedMap" in phases["asdict"].types
+    assert any(m.startswith("wf build: ") for m in caplog.messages)
+    assert any(m.startswith("RefExpr._store: ") for m in caplog.messages)
@@ -0,0 +1,133 @@
+import logging
+
+from ghgen.syntax import *
+
+
+def _build(spec, **kwargs) -> dict:
+    return workflow(spec, prune=True, **kwargs).worfklow.asdict()
+
+
+def test_prune_is_opt_in():
+    def wf():
+        on.workflow_dispatch()
+        run("a").if_(False)
+        run("b")
+
+    steps = workflow(wf).worfklow.asdict()["jobs"]["wf"]["steps"]
+    assert [s["run"] for s in steps] == ["a", "b"]
+
+
+def test_prune_steps_by_matrix():
+    def wf():
+        on.workflow_dispatch()
+        strategy.matrix(os=["ubuntu", "macos"], python=["3.13", "3.14"]).exclude(
+            {"os": "macos", "python": "3.13"}
+        ).include({"os": "windows", "python": "3.14"})
+        run("never").if_(matrix.os == "freebsd")
+        run("unix").if_(matrix.os != "windows")
+        run("excluded").if_((matrix.os == "macos") & (matrix.python == "3.13"))
+        run("always").if_((matrix.python == "3.13") | (matrix.python == "3.14"))
+        run("runtime").if_((matrix.os == "freebsd") & (github.ref == "main"))
+        run("status").if_(always() | (matrix.os == "freebsd"))
+
+    steps = _build(wf)["jobs"]["wf"]["steps"]
+    assert [(s["run"], s.get("if")) for s in steps] == [
+        ("unix", "matrix.os != 'windows'"),
+        ("always", None),
+        ("status", "always()"),
+    ]
+
+
+def test_prune_keeps_referenced_steps():
+    def wf():
+        on.workflow_dispatch()
+        strategy.matrix(x=[1, 2])
+        run("skipped").if_(matrix.x == 3).id("skipped")
+        run("check").if_(steps.skipped.outcome == "skipped")
+
+    built = _build(wf)["jobs"]["wf"]["steps"]
+    assert [s["run"] for s in built] == ["skipped", "check"]
+
+
+def test_prune_jobs_by_inputs():
+    def wf():
+        on.workflow_dispatch()
+        flag = on.input.default(False)
+        mode = on.input.options("fast", "slow").required()
+
+        @job
+        def never():
+            if_(flag & (mode == "medium"))
+            run("x")
+
+        @job
+        def dependent():
+            needs(never)
+            run("x")
+
+        @job
+        def cleanup():
+            needs(dependent)
+            if_(always())
+            run("x")
+
+        @job
+        def sometimes():
+            if_(flag)
+            run("x")
+
+    jobs = _build(wf)["jobs"]
+    assert list(jobs) == ["never", "dependent", "cleanup", "sometimes"]
+
+    def wf():
+        on.workflow_dispatch()
+        flag = on.input.default(False)
+        mode = on.input.options("fast", "slow").required()
+
+        @job
+        def never():
+            if_(flag & (mode == "medium"))
+            run("x")
+
+        @job
+        def dependent():
+            needs(never)
+            run("x")
+
+        @job
+        def sometimes():
+            if_(flag)
+            run("x")
+
+    jobs = _build(wf)["jobs"]
+    assert list(jobs) == ["sometimes"]
+    assert jobs["sometimes"]["if"] == "${{ inputs.flag }}"
+
+
+def test_prune_inputs_on_other_triggers_may_be_null():
+    def wf():
+        on.workflow_dispatch().push()
+        flag = on.input.default(False)
+
+        @job
+        def maybe():
+            # only true if `inputs.flag` is null
+            if_(contains(toJson(flag), "null"))
+            run("x")
+
+        @job
+        def other():
+            run("x")
+
+    assert list(_build(wf)["jobs"]) == ["maybe", "other"]
+
+
+def test_prune_reports(caplog):
+    def wf():
+        on.workflow_dispatch()
+        run("never").if_(False)
+        run("x")
+
+    with caplog.at_level(logging.DEBUG):
+        _build(wf)
+    assert "wf.wf: dropped 'never', its condition is always false" in caplog.messages
@@ -160,3 +160,48 @@ def test_empty_ruleset_always_pass_when_no_contexts(sut_with_empty_rule):
     assert sut_with_empty_rule.validate(42)
     assert sut_with_empty_rule.validate(LiteralExpr(42) & "foo")
     assert sut_with_empty_rule.mock.mock_calls == []
+
+
+def test_rules_mix_wildcards_in_definition_order():
+    calls = []
+
+    class X(RuleSet):
+        @rule(x.z._)
+        def v(self, *args):
+            calls.append(("wildcard", *args))
+            return True
+
+        @rule(x.z.foo)
+        def v(self, *args):
+            calls.append(("exact", *args))
+            return True
+
+    assert X().validate(x.z.foo.a & x.z.bar)
+    assert calls == [("wildcard", "foo"), ("exact",), ("wildcard", "bar")]
+
+
+def test_derived_rules_do_not_leak_into_base():
+    calls = []
+
+    class Base(RuleSet):
+        @rule(x.y)
+        def v(self):
+            calls.append("base")
+            return True
+
+    class Derived(Base):
+        @rule(x.a)
+        def w(self):
+            calls.append("derived")
+            return True
+
+        @rule(x.y)
+        def u(self):
+            calls.append("derived y")
+            return True
+
+    assert Base().validate(x.y & x.a)
+    assert calls == ["base"]
+    calls.clear()
+    assert Derived().validate(x.y & x.a)
+    assert calls == ["base", "derived y", "derived"]
@@ -0,0 +1,207 @@
+import random
+
+import pytest
+
+from src.ghgen.expr import *
+from src.ghgen.expr import _truthy
+from src.ghgen.simplify import simplify, has_status_check
+import ghgen.syntax
+
+
+@pytest.fixture(autouse=True)
+def reset_ref_expr_store():
+    RefExpr._store.clear()
+
+
+a = RefExpr("a")
+b = RefExpr("b")
+c = RefExpr("c")
+always = function("always", 0)
+success = function("success", 0)
+failure = function("failure", 0)
+cancelled = function("cancelled", 0)
+contains = function("contains", 2)
+
+
+@pytest.mark.parametrize(
+    "expr,expected",
+    [
+        (LiteralExpr(True) & a, "a"),
+        (LiteralExpr(False) & a, "false"),
+        (LiteralExpr("") | a, "a"),
+        (LiteralExpr("x") | a, "'x'"),
+        (LiteralExpr(1) == 1, "true"),
+        (LiteralExpr("ABC") == "abc", "true"),
+        (LiteralExpr("1") < 2, "true"),
+        (~LiteralExpr(0), "true"),
+        (~(a == b), "a != b"),
+        (~~(a == b), "a == b"),
+        (~~a, "!!a"),
+        (a & a, "a"),
+        (a | a, "a"),
+        (a & (a | b), "a"),
+        (a | (a & b), "a"),
+        (a & (b | a), "a && (b || a)"),
+        (a & LiteralExpr(True), "a && true"),
+        ((a == b) & LiteralExpr(True), "a == b"),
+        ((a == b) | LiteralExpr(False), "a == b"),
+        (always() | a, "always()"),
+        (always() & cancelled(), "cancelled()"),
+        (always() & a, "always() && a"),
+        (a & b & a, "a && b && a"),
+        (contains(a, (LiteralExpr(1) == 1) & b), "contains(a, b)"),
+    ],
+)
+def test_simplify(expr, expected):
+    assert simplify(expr)._formula == expected
+
+
+@pytest.mark.parametrize(
+    "expr,expected",
+    [
+        (~~a, "a"),
+        (a & LiteralExpr(True), "a"),
+        (a | LiteralExpr(0), "a"),
+        (a & LiteralExpr(""), "''"),
+        (a & b & a, "a && b"),
+        (a & (b | a), "a"),
+        ((a | b) & ~a & a, "false"),
+        (a | b | ~b, "true"),
+        (a | always(), "always()"),
+        # a status check must not be folded away, or the runner adds `success() &&`
+        (LiteralExpr(True) | cancelled(), "always()"),
+        ((a | LiteralExpr(True)) | cancelled(), "always()"),
+        (a & (LiteralExpr(True) | cancelled()), "always() && a"),
+        (LiteralExpr(False) & cancelled(), "false"),
+    ],
+)
+def test_simplify_condition(expr, expected):
+    assert simplify(expr, condition=True)._formula == expected
+
+
+def test_simplify_deep_chain():
+    refs = [RefExpr(f"x{i}") for i in range(300)]
+    e = LiteralExpr(True)
+    for r in refs:
+        e = e & r & r
+    assert simplify(e)._formula == " && ".join(f"x{i}" for i in range(300))
+
+
+# --- randomized equivalence -----------------------------------------------------
+#
+# Random expressions over a few contexts and literals are evaluated before and
+# after simplification, with Actions semantics, for all assignments of the
+# contexts from a pool of values and all job statuses.
+
+_literals = [None, True, False, 0, 1, 2.5, "", "a", "A", "1", "true"]
+_statuses = ["success", "failure", "cancelled"]
+
+
+def _evaluate(e: Expr, values: dict, status: str):
+    return evaluate(e, {**values, "job": {"status": status}})
+
+
+def _run_condition(e: Expr, values: dict, status: str) -> bool:
+    if not has_status_check(e):
+        # the runner's implicit `success() &&`
+        return status == "success" and _truthy(_evaluate(e, values, status))
+    return _truthy(_evaluate(e, values, status))
+
+
+def _random_expr(rng: random.Random, depth: int) -> Expr:
+    if depth == 0 or rng.random() < 0.25:
+        match rng.randrange(3):
+            case 0:
+                return rng.choice([a, b, c])
+            case 1:
+                return LiteralExpr(rng.choice(_literals))
+            case _:
+                return rng.choice([always, success, failure, cancelled])()
+    match rng.choice(["&&", "&&", "||", "||", "!", "==", "!=", "<", ">="]):
+        case "!":
+            return NotExpr(_random_expr(rng, depth - 1))
+        case op:
+            return BinOpExpr(
+                _random_expr(rng, depth - 1), _random_expr(rng, depth - 1), op
+            )
+
+
+def _same_value(x, y) -> bool:
+    return type(x) is type(y) and x == y
+
+
+def _assignments(rng: random.Random, count: int):
+    for _ in range(count):
+        yield dict(zip("abc", (rng.choice(_literals) for _ in range(3))))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_simplify_preserves_values(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        e = _random_expr(rng, 4)
+        s = simplify(e)
+        for values in _assignments(rng, 10):
+            for status in _statuses:
+                assert _same_value(
+                    _evaluate(e, values, status), _evaluate(s, values, status)
+                ), f"{e._formula} simplified to {s._formula} with {values}, {status}"
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_simplify_preserves_conditions(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        e = _random_expr(rng, 4)
+        s = simplify(e, condition=True)
+        for values in _assignments(rng, 10):
+            for status in _statuses:
+                assert _run_condition(e, values, status) == _run_condition(
+                    s, values, status
+                ), f"{e._formula} simplified to {s._formula} with {values}, {status}"
+
+
+# --- workflow opt-in ------------------------------------------------------------
+
+
+def _conditions(simplify: bool) -> list:
+    from ghgen.syntax import on, run, github, cancelled
+
+    def redundant():
+        on.workflow_dispatch()
+        main = github.ref == "refs/heads/main"
+        run("a").if_(main & main & ~~(github.actor == "me"))
+        run("b").if_(True | cancelled())
+        run("c").env(MAIN=main | main)
+
+    wf = ghgen.syntax.workflow(redundant, simplify=simplify).worfklow
+    return [
+        (s.get("if"), s["run"], s.get("env"))
+        for s in wf.asdict()["jobs"]["redundant"]["steps"]
+    ]
+
+
+def test_workflow_simplify_is_opt_in():
+    assert _conditions(simplify=False) == [
+        (
+            "github.ref == 'refs/heads/main' && github.ref == 'refs/heads/main' && !!(github.actor == 'me')",
+            "a",
+            None,
+        ),
+        ("true || cancelled()", "b", None),
+        (
+            None,
+            "c",
+            {
+                "MAIN": "${{ github.ref == 'refs/heads/main' || github.ref == 'refs/heads/main' }}"
+            },
+        ),
+    ]
+
+
+def test_workflow_simplify():
+    assert _conditions(simplify=True) == [
+        ("github.ref == 'refs/heads/main' && github.actor == 'me'", "a", None),
+        ("always()", "b", None),
+        (None, "c", {"MAIN": "${{ github.ref == 'refs/heads/main' }}"}),
+    ]
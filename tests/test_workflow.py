@@ -1,7 +1,13 @@
+import concurrent.futures
+import sys
 import typing
+import unittest.mock
+
+import pytest
 
 from conftest import expect
 from ghgen.syntax import *
+from src.ghgen import render
 
 
 @expect("""\
@@ -1205,10 +1211,8 @@ def test_job_as_context():
       j1:
         runs-on: ubuntu-latest
         container:
-          image: ghcr.io/owner/image
-          credentials:
-            username: foo
-            password: baz
+          image: node:18
+          credentials: {}
           env:
             NODE_ENV: development
           ports:
@@ -1220,7 +1224,11 @@ def test_job_as_context():
         steps:
         - run: echo ${{ job.container.id }}
       j2:
-        container: {}
+        container:
+          image: ghcr.io/owner/image
+          credentials:
+            username: foo
+            password: baz
     """)
 def test_container():
     on.workflow_dispatch()
@@ -1816,3 +1824,284 @@ def test_job_continue_on_error_default_true():
         runs_on("ubuntu-latest")
         # no argument defaults to True
         continue_on_error()
+
+
+def test_validation_is_cached_within_a_job():
+    def wf():
+        on.workflow_dispatch()
+        strategy.matrix(os=["linux", "windows"])
+        for i in range(5):
+            run(f"step {i}").if_(matrix.os == "linux")
+
+    with unittest.mock.patch.object(
+        RuleSet, "validate", autospec=True, return_value=True
+    ) as validate:
+        workflow(wf).worfklow
+    conditions = [c for c in validate.call_args_list if c.kwargs["field"] == "if_"]
+    assert len(conditions) == 1
+
+
+def test_assigned_names_are_resolved_once_per_call_site():
+    import executing
+
+    def wf():
+        on.workflow_dispatch()
+        for i in range(5):
+            step = run(f"echo {i}")
+            run(f"echo {step.outcome}")
+
+    call_sites = []
+    resolve = executing.Source.executing
+
+    @classmethod
+    def record(cls, frame):
+        call_sites.append((frame.f_code, frame.f_lasti))
+        return resolve(frame)
+
+    with unittest.mock.patch.object(executing.Source, "executing", record):
+        steps = workflow(wf).worfklow.asdict()["jobs"]["wf"]["steps"]
+    assert len(call_sites) == len(set(call_sites))
+    assert [s.get("id") for s in steps[::2]] == [
+        "step",
+        "step-1",
+        "step-2",
+        "step-3",
+        "step-4",
+    ]
+
+
+def test_allocated_step_ids_skip_taken_ones():
+    def wf():
+        on.workflow_dispatch()
+        run("x").id("build-1")
+        for i in range(3):
+            build = run(f"build {i}")
+            run(f"echo {build.outcome}")
+        run("y").id("build-4")
+
+    steps = workflow(wf).worfklow.asdict()["jobs"]["wf"]["steps"]
+    assert [s.get("id") for s in steps] == [
+        "build-1",
+        "build",
+        None,
+        "build-2",
+        None,
+        "build-3",
+        None,
+        "build-4",
+    ]
+    assert steps[4]["run"] == "echo ${{ steps.build-2.outcome }}"
+
+
+def test_merges_leave_given_values_alone():
+    given = {"A": "a"}
+    matrix_values = {"os": ["linux"]}
+
+    def wf():
+        on.workflow_dispatch()
+        env(given)
+        for key in "BCD":
+            env(**{key: key.lower()})
+        strategy.matrix(**matrix_values)
+        strategy.matrix(os=["windows"]).matrix(python=["3.14"])
+        run("x")
+
+    built = workflow(wf).worfklow.asdict()
+    assert given == {"A": "a"}
+    assert matrix_values == {"os": ["linux"]}
+    assert built["env"] == {"A": "a", "B": "b", "C": "c", "D": "d"}
+    assert built["jobs"]["wf"]["strategy"]["matrix"] == {
+        "os": ["linux", "windows"],
+        "python": ["3.14"],
+    }
+
+
+def test_threaded_builds():
+    def make(i: int) -> WorkflowInfo:
+        def spec():
+            on.workflow_dispatch()
+
+            @job
+            def build():
+                container.image(f"image-{i}")
+                env(INDEX=str(i))
+                for k in range(20):
+                    shard = run(f"echo {i}.{k}")
+                    run(t"echo {shard.outcome}")
+                if i % 2:
+                    run(t"echo {steps.missing.outcome}")
+
+        spec.__name__ = f"wf{i}"
+        return workflow(spec)
+
+    def build(i: int) -> str | list[str]:
+        try:
+            return render(make(i))
+        except GenerationError as e:
+            return [f"{error.workflow_id}: {error.message}" for error in e.errors]
+
+    serial = [build(i) for i in range(16)]
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        assert list(executor.map(build, range(16))) == serial
+    assert serial[1] == ["wf1: step `missing` not defined yet in job `build`"]
+    assert "image: image-2" in serial[2]
+
+
+def test_render_all(tmp_path):
+    from src.ghgen import render_all, GenerationError
+
+    (tmp_path / "one.py").write_text("""\
+from src.ghgen.syntax import *
+
+
+@workflow
+def first():
+    on.workflow_dispatch()
+    run("echo 1")
+
+
+@workflow(id="second")
+def other():
+    on.push()
+    run("echo 2")
+""")
+    (tmp_path / "two.py").write_text("""\
+from src.ghgen.syntax import *
+
+
+@workflow
+def broken():
+    on.workflow_dispatch()
+    run(steps.nope.outcome)
+""")
+    rendered = render_all([tmp_path / "one.py"])
+    assert list(rendered) == ["first", "second"]
+    assert rendered["second"].startswith("# generated from one.py::other\n")
+    assert "run: echo 2" in rendered["second"]
+    assert sorted(tmp_path.iterdir()) == [tmp_path / "one.py", tmp_path / "two.py"]
+
+    with pytest.raises(GenerationError) as e:
+        render_all([tmp_path])
+    assert [error.message for error in e.value.errors] == [
+        "step `nope` not defined yet in job `broken`"
+    ]
+
+
+def test_render_all_reloads_changed_modules(tmp_path):
+    from src.ghgen import render_all
+
+    helper = tmp_path / "loader_helper.py"
+    helper.write_text('NAME = "first"\n')
+    (tmp_path / "loader_wf.py").write_text("""\
+from src.ghgen.syntax import *
+from loader_helper import NAME
+
+
+@workflow
+def uses_helper():
+    on.push()
+    run(f"echo {NAME}")
+""")
+    (tmp_path / "loader_other.py").write_text("""\
+from src.ghgen.syntax import *
+
+
+@workflow
+def standalone():
+    on.push()
+    run("echo other")
+""")
+    assert "run: echo first" in render_all([tmp_path])["uses_helper"]
+    modules = {
+        m: sys.modules[m] for m in ("loader_helper", "loader_wf", "loader_other")
+    }
+    assert tmp_path.as_posix() not in sys.path
+
+    render_all([tmp_path])
+    assert all(sys.modules[m] is mod for m, mod in modules.items())
+
+    helper.write_text('NAME = "second one"\n')
+    assert "run: echo second one" in render_all([tmp_path])["uses_helper"]
+    assert sys.modules["loader_helper"] is not modules["loader_helper"]
+    assert sys.modules["loader_wf"] is not modules["loader_wf"]
+    assert sys.modules["loader_other"] is modules["loader_other"]
+
+
+def test_render_is_repeatable():
+    @workflow
+    def twice():
+        on.workflow_dispatch()
+        run("echo")
+
+    first = render(twice)
+    assert "  workflow_dispatch: {}\n" in first
+    assert render(twice) == first
+
+
+@pytest.mark.parametrize("backend", ["threads", "interpreters"])
+def test_generate_backends(tmp_path, caplog, backend):
+    import argparse
+    import logging
+    from src.ghgen.commands.generate import generate_all
+
+    if backend == "interpreters":
+        pytest.importorskip("concurrent.interpreters")
+    inputs = tmp_path / "workflows"
+    inputs.mkdir()
+    (inputs / "backend_helper.py").write_text('NAME = "helper"\n')
+    (inputs / "backend_one.py").write_text("""\
+from src.ghgen.syntax import *
+from backend_helper import NAME
+
+
+@workflow
+def first():
+    on.workflow_dispatch()
+    run(f"echo {NAME}")
+
+
+@workflow(id="second")
+def other():
+    on.push()
+    run("echo 2")
+""")
+    (inputs / "backend_two.py").write_text("""\
+from src.ghgen.syntax import *
+
+
+@workflow
+def broken():
+    on.workflow_dispatch()
+    run(steps.nope.outcome)
+
+
+@workflow
+def fine():
+    on.push()
+    run("echo fine")
+""")
+
+    def generate(output, **kwargs):
+        output.mkdir()
+        opts = argparse.Namespace(
+            includes=[inputs],
+            inputs=[],
+            output_directory=output,
+            check=False,
+            **kwargs,
+        )
+        caplog.clear()
+        code = generate_all(opts)
+        errors = [r.msg for r in caplog.records if r.levelno == logging.ERROR]
+        return code, {p.name: p.read_text() for p in output.iterdir()}, errors
+
+    serial = generate(tmp_path / "serial")
+    code, outputs, errors = serial
+    assert code == 1
+    assert sorted(outputs) == ["fine.yml", "first.yml", "second.yml"]
+    assert "run: echo helper" in outputs["first.yml"]
+    assert [(e.workflow_id, e.lineno, e.message) for e in errors] == [
+        ("broken", 7, "step `nope` not defined yet in job `broken`")
+    ]
+    assert errors[0].filename.endswith("backend_two.py")
+    assert generate(tmp_path / backend, backend=backend, threads=4) == serial